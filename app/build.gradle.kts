@@ -53,6 +53,7 @@ chaquopy {
             install("cryptography")
             install("requests")
             install("tqdm")
+            install("numpy")
         }
     }
 }
@@ -2,6 +2,9 @@
 
 import base64
 import binascii
+import errno
+import hashlib
+import io
 import os
 import struct
 import sys
@@ -10,7 +13,20 @@ import time
 import json
 import subprocess
 import re
-from urllib.request import urlopen, Request
+import shutil
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from urllib.error import HTTPError
+from wiiu_http import get_pool, open_url
+from wiiu_hosts import content_url
+import wiiu_hosts
+import wiiu_metacache
+import wiiu_ratelimit
+import wiiu_retry
+import wiiu_store
+from wiiu_transfer import (DEFAULT_MIN_THROUGHPUT, DEFAULT_READ_SIZE, DEFAULT_STALL_TIMEOUT, ContentProgress,
+                           RangeNotSupportedError, StallMonitor, TransferSettings, cancel_mirror, download_stats,
+                           is_cancelled, load_segment_state, save_segment_state)
 
 # Import the TK constant and other necessary components from FunKiiU
 TK = 0x140  # Ticket offset constant from FunKiiU
@@ -25,74 +41,946 @@ app_categories = {
     '000C',  # DLC
 }
 
+# Number of content files downloaded at the same time
+DEFAULT_DOWNLOAD_THREADS = 4
+
+# Large contents are split into byte ranges fetched in parallel
+DEFAULT_SEGMENTS = 4
+DEFAULT_MIN_SEGMENT_SIZE = 32 * 1024 * 1024
+
+# Duplicate the slowest segment once the others are done if it still has this much left
+HEDGE_MIN_BYTES = 4 * 1024 * 1024
+
+# Tickets and .h3 files fetched at the same time once the TMD is parsed
+DEFAULT_PREFETCH_WORKERS = 8
+
+# Content bytes covered by one hash of a .h3 file (4096 hash-tree blocks of 0x10000)
+H3_GROUP_SIZE = 0x10000 * 4096
+
+
+# One reusable read buffer per thread
+_read_buffers = threading.local()
+
+
+def get_read_buffer(size):
+    """Return this thread's read buffer of `size` bytes and whether it had to be allocated"""
+    buf = getattr(_read_buffers, 'buf', None)
+    if buf is None or len(buf) != size:
+        buf = _read_buffers.buf = memoryview(bytearray(size))
+        return buf, True
+    return buf, False
+
 
 def download_with_retry(url, max_retries=3, retry_delay=2, **kwargs):
-    """Download with automatic retry on failure"""
-    for attempt in range(max_retries):
+    """
+    Download with automatic retry on failure
+
+    Failures go through the wiiu_retry policy: permanent errors (HTTP 4xx)
+    are raised at once, transient ones are retried with exponential backoff
+    starting at `retry_delay` seconds. A retry resumes after the bytes
+    already received with a Range request instead of starting the body over,
+    for in-memory downloads too. `url` may be a wiiu_hosts.HostPath, then
+    every attempt picks a host and a retry can continue on another one.
+    """
+    outfile = kwargs.get('outfile')
+    buffer = None
+    if not outfile:
+        # Collect in-memory bodies in a buffer so a retry can resume them
+        buffer = outfile = kwargs['outfile'] = io.BytesIO()
+    start_pos = outfile.tell()
+    byte_range = kwargs.pop('byte_range', None)
+    progress_offset = kwargs.pop('progress_offset', 0)
+
+    def fetch(current):
+        resumed = outfile.tell() - start_pos
+        if resumed:
+            start = (byte_range[0] if byte_range else 0) + resumed
+            end = byte_range[1] if byte_range else None
+            if end is not None and start > end:
+                return None
+            print(f"  ↻ Resuming at byte {start}")
+            try:
+                return download(current, byte_range=(start, end), progress_offset=progress_offset + resumed, **kwargs)
+            except RangeNotSupportedError:
+                if byte_range:
+                    raise
+                print(f"  ⚠ Server ignored Range request, restarting from the beginning")
+                with wiiu_retry.local_writes():
+                    outfile.seek(start_pos)
+                    outfile.truncate()
+        return download(current, byte_range=byte_range, progress_offset=progress_offset, **kwargs)
+
+    def attempt(n, current):
+        if not hasattr(url, 'record'):
+            return fetch(current)
+        # Teach the host set how fast this host delivered
+        before = outfile.tell()
+        started = time.monotonic()
+        ok = False
         try:
-            return download(url, **kwargs)
-        except Exception as e:
-            if attempt < max_retries - 1:
-                print(f"  ↻ Retry {attempt + 1}/{max_retries} in {retry_delay}s...")
-                time.sleep(retry_delay)
-            else:
-                print(f"  ✗ Failed after {max_retries} attempts: {e}")
-                raise
+            result = fetch(current)
+            ok = True
+            return result
+        finally:
+            url.record(current, outfile.tell() - before, time.monotonic() - started, ok)
+
+    wiiu_retry.get_policy().run(url, attempt, max_retries=max_retries, base_delay=retry_delay,
+                                passthrough=(RangeNotSupportedError,))
+    if buffer is not None and not is_cancelled(kwargs.get('token')):
+        return buffer.getvalue()
     return None
 
 
-def download(url, printprogress=False, outfile=None, message_prefix='', message_suffix='', bridge=None, chunk_callback=None, token=None):
-    """Download a single file with progress tracking"""
+def download(url, printprogress=False, outfile=None, message_prefix='', message_suffix='', bridge=None, chunk_callback=None, token=None,
+             byte_range=None, progress_offset=0, read_size=None, limiter=None, stall_timeout=None, settings=None):
+    """
+    Download a single file with progress tracking
+
+    The body is read with readinto() into a reusable per-thread buffer, or
+    straight into a preallocated bytearray when no outfile is given, so the
+    loop allocates nothing per chunk.
+
+    byte_range: Optional (start, end) tuple to fetch only part of the file,
+        end is inclusive or None for the rest of the file
+    progress_offset: Bytes already on disk from an earlier attempt, added to reported progress
+    read_size: Bytes requested from the socket per read (defaults to settings.read_size)
+    limiter: Optional wiiu_ratelimit.Throttle that paces the reads
+    stall_timeout: Seconds without data before the read fails (defaults to settings.stall_timeout);
+        a transfer slower than settings.min_throughput fails too, so the retry reconnects and resumes.
+        Time spent waiting on the limiter does not count against the throughput.
+    settings: TransferSettings of the job (module defaults when None)
+    """
+    settings = settings or TransferSettings()
+    read_size = read_size or settings.read_size
+    stall_timeout = stall_timeout or settings.stall_timeout
+    monitor = StallMonitor(settings.min_throughput)
+    cn = None
+    reads = 0
+    allocations = 0
+    totalread = 0
     try:
-        cn = urlopen(url)
+        if byte_range:
+            start, end = byte_range
+            cn = open_url(url, headers={'Range': f'bytes={start}-{"" if end is None else end}'},
+                          timeout=stall_timeout)
+            if cn.status != 206:
+                cn.close()
+                raise RangeNotSupportedError(f"Server ignored Range request for {url}")
+            content_range = cn.headers.get('Content-Range', '')
+            if not content_range.startswith(f'bytes {start}-'):
+                cn.close()
+                raise IOError(f"Unexpected Content-Range '{content_range}' for bytes {start}-")
+        else:
+            cn = open_url(url, timeout=stall_timeout)
         totalsize = int(cn.headers['content-length'])
-        totalread = 0
         
-        if not outfile:
-            ct = b''
+        if outfile:
+            view, allocated = get_read_buffer(read_size)
+            allocations += allocated
+        else:
+            ct = bytearray(totalsize)
+            view = memoryview(ct)
+            allocations += 1
             
         while totalsize > totalread:
             # Check for cancellation
-            if token and hasattr(token, 'is_cancelled') and token.is_cancelled():
-                print("\nDownload cancelled by user")
-                if bridge:
-                    bridge.update(0, "Download cancelled", 0, 0, 0, 0)
+            if is_cancelled(token):
+                # A hedged duplicate that lost the race stops quietly
+                if not getattr(token, 'superseded', False):
+                    print("\nDownload cancelled by user")
+                    if bridge:
+                        bridge.update(0, "Download cancelled", 0, 0, 0, 0)
+                cn.close()
                 return None
             
             # Read in chunks
-            toread = min(totalsize - totalread, 64 * 1024)  # 64KB chunks
-            co = cn.read(toread)
-            if not co:  # End of stream
+            toread = min(totalsize - totalread, read_size)
+            if outfile:
+                chunk = view[:toread]
+            else:
+                chunk = view[totalread:totalread + toread]
+            n = cn.readinto(chunk)
+            reads += 1
+            if not n:  # End of stream
                 break
                 
-            totalread += len(co)
+            totalread += n
+            if limiter:
+                monitor.pause(limiter.consume(n))
+            monitor.update(n)
             
             # Update progress callback
             if chunk_callback and callable(chunk_callback):
-                chunk_callback(totalread, totalsize)
+                chunk_callback(progress_offset + totalread, progress_offset + totalsize)
             
             # Print progress to console
             if printprogress:
-                percent = min(totalread * 100 / totalsize, 100) if totalsize > 0 else 0
-                print(f'\r{message_prefix} {percent:5.1f}% {totalread:10} / {totalsize:10} bytes', end='')
+                fileread = progress_offset + totalread
+                filesize = progress_offset + totalsize
+                percent = min(fileread * 100 / filesize, 100) if filesize > 0 else 0
+                print(f'\r{message_prefix} {percent:5.1f}% {fileread:10} / {filesize:10} bytes', end='')
                 sys.stdout.flush()
             
             # Write to file
             if outfile:
-                outfile.write(co)
-            else:
-                ct += co
+                with wiiu_retry.local_writes():
+                    outfile.write(chunk[:n])
         
         if printprogress:
             print()  # New line after progress
+
+        if totalread < totalsize:
+            raise IOError(f"Connection closed after {totalread} of {totalsize} bytes")
             
-        return ct if not outfile else None
+        return bytes(ct) if not outfile else None
         
+    except RangeNotSupportedError:
+        raise
     except Exception as e:
+        if cn is not None:
+            cn.close()
         print(f"\nDownload error for {url}: {e}")
         if bridge:
             bridge.update(0, f"Download error: {e}", 0, 0, 0, 0)
         raise
+    finally:
+        download_stats.add(totalread, reads, allocations)
+
+
+def download_resumable(url, file_path, content_size, **kwargs):
+    """
+    Download a file sequentially, resuming after any bytes already on disk
+
+    A partial file left by an earlier run is continued with a
+    `Range: bytes=N-` request. If the server ignores the Range request the
+    file is downloaded again from the start.
+    """
+    offset = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+    if offset >= content_size:
+        offset = 0
+
+    if offset:
+        print(f"  ↻ Resuming {os.path.basename(file_path)} at {offset / (1024 * 1024):.1f} MB")
+        try:
+            with open(file_path, 'r+b') as f:
+                f.seek(offset)
+                f.truncate()
+                return download_with_retry(url, outfile=f, byte_range=(offset, None), progress_offset=offset, **kwargs)
+        except RangeNotSupportedError:
+            print(f"  ⚠ Server ignored Range request, restarting from the beginning")
+
+    with open(file_path, 'wb') as f:
+        return download_with_retry(url, outfile=f, **kwargs)
+
+
+def plan_segments(content_size, segments=DEFAULT_SEGMENTS, min_segment_size=DEFAULT_MIN_SEGMENT_SIZE):
+    """Split a file into [start, end, done] ranges of at least min_segment_size, one range if it is too small"""
+    segment_count = max(1, min(int(segments or 1), content_size // max(1, int(min_segment_size))))
+    segment_size = content_size // segment_count
+    state = []
+    for n in range(segment_count):
+        start = n * segment_size
+        end = content_size - 1 if n == segment_count - 1 else start + segment_size - 1
+        state.append([start, end, 0])
+    return state
+
+
+def preallocate(file_path, size):
+    """
+    Create or resize file_path to size bytes with its blocks reserved on disk
+
+    Uses posix_fallocate where the OS and file system support it and only
+    extends the file (sparse) otherwise. Existing bytes are kept.
+    Raises OSError (ENOSPC) when the space cannot be reserved.
+    """
+    with open(file_path, 'r+b' if os.path.exists(file_path) else 'wb') as f:
+        if os.fstat(f.fileno()).st_size > size:
+            f.truncate(size)
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return True
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL):
+                    raise
+        f.truncate(size)
+        return False
+
+
+def allocated_bytes(file_path):
+    """Bytes of a file actually backed by disk blocks (holes of a sparse file do not count)"""
+    if not os.path.exists(file_path):
+        return 0
+    st = os.stat(file_path)
+    blocks = getattr(st, 'st_blocks', None)
+    return st.st_size if blocks is None else min(st.st_size, blocks * 512)
+
+
+def reserve_contents(contents, game_dir, segments=DEFAULT_SEGMENTS, min_segment_size=DEFAULT_MIN_SEGMENT_SIZE,
+                     allocate=True, store=None):
+    """
+    Make sure the missing contents of a title fit on disk before any is downloaded
+
+    The bytes still to be written (minus blocks already allocated) are
+    checked against the free space first. With `allocate` every missing
+    .app is then preallocated to its TMD size and gets a `.part` state file
+    recording how much of it was downloaded, so a preallocated file is never
+    taken for a complete one and a resume continues after the downloaded
+    bytes. A partial file of an earlier sequential download keeps its bytes
+    as the downloaded part of a single range. Contents the content `store`
+    can link are not preallocated, and only count when the store is on
+    another file system (where linking falls back to a copy).
+
+    Raises OSError (ENOSPC) when the space cannot be reserved.
+    Returns the number of bytes that had to be reserved
+    """
+    missing = []
+    needed = 0
+    same_device = store is not None and store.same_device(game_dir)
+    for content in contents:
+        content_id, content_type, content_size = content[:3]
+        file_path = os.path.join(game_dir, content_id + '.app')
+        part_path = file_path + '.part'
+        if os.path.exists(file_path) and os.path.getsize(file_path) == content_size and not os.path.exists(part_path):
+            continue
+        if store is not None and store.contains(content):
+            if not same_device:
+                needed += content_size + (h3_size(content_size) if content_type & 0x2 else 0)
+            continue
+        missing.append((file_path, content_size))
+        needed += content_size - min(allocated_bytes(file_path), content_size)
+        if content_type & 0x2:
+            needed += h3_size(content_size)
+
+    free = free_disk_space(game_dir)
+    if needed > free:
+        raise OSError(errno.ENOSPC, f"Not enough space: {needed / (1024 * 1024):.1f} MB needed, "
+                                    f"{free / (1024 * 1024):.1f} MB free")
+    if not allocate:
+        return needed
+
+    created = []
+    try:
+        for file_path, content_size in missing:
+            state = load_segment_state(file_path, content_size)
+            if state is None:
+                existing = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+                if 0 < existing < content_size and not os.path.exists(file_path + '.part'):
+                    state = [[0, content_size - 1, existing]]
+                else:
+                    state = plan_segments(content_size, segments, min_segment_size)
+                    if not existing:
+                        created.append(file_path)
+            preallocate(file_path, content_size)
+            save_segment_state(file_path, content_size, state)
+    except OSError:
+        # Give back the space of the files reserved by this call
+        for file_path in created:
+            for path in (file_path, file_path + '.part'):
+                if os.path.exists(path):
+                    os.remove(path)
+        raise
+    return needed
+
+
+class SegmentToken:
+    """Cancellation token of one request of a segment, also stopped once a duplicate request wins"""
+
+    def __init__(self, token):
+        self.token = token
+        self.superseded = False
+
+    def is_cancelled(self):
+        return self.superseded or is_cancelled(self.token)
+
+
+def download_segmented(url, file_path, content_size, segments=DEFAULT_SEGMENTS, min_segment_size=DEFAULT_MIN_SEGMENT_SIZE,
+                       bridge=None, chunk_callback=None, token=None, max_retries=3, retry_delay=1, limiter=None,
+                       hedge=False, settings=None):
+    """
+    Download one file as parallel byte ranges written into a preallocated file
+
+    The file is split into at most `segments` ranges of at least
+    `min_segment_size` bytes. Falls back to a single stream when the file is
+    too small to split or the server ignores Range requests.
+
+    With a wiiu_hosts.HostPath the ranges are striped across its hosts.
+    With `hedge`, once the first ranges are done the one with the most bytes
+    left is requested a second time (on another host if possible) and
+    whichever request finishes first wins.
+    Progress of each range is kept in `<file>.part` so an interrupted
+    download resumes every range where it stopped. The file only counts as
+    complete once the `.part` file is gone.
+
+    Returns True when the file is complete, None if cancelled
+    """
+    part_path = file_path + '.part'
+
+    def single_stream():
+        if os.path.exists(part_path):
+            os.remove(part_path)
+            os.remove(file_path)
+        download_resumable(url, file_path, content_size, bridge=bridge, chunk_callback=chunk_callback, token=token,
+                           max_retries=max_retries, retry_delay=retry_delay, limiter=limiter, settings=settings)
+        return None if is_cancelled(token) else True
+
+    # Each entry is [start, end, done] with end inclusive
+    state = load_segment_state(file_path, content_size)
+    if state is None and os.path.exists(file_path) and 0 < os.path.getsize(file_path) < content_size:
+        # Continue a partial file from an earlier sequential download
+        return single_stream()
+    if state is None:
+        state = plan_segments(content_size, segments, min_segment_size)
+        if len(state) < 2:
+            return single_stream()
+
+        # Preallocate so every segment can write at its own offset
+        preallocate(file_path, content_size)
+        save_segment_state(file_path, content_size, state)
+
+    # A state file written by reserve_contents() marks a preallocated file, done counts the downloaded bytes
+    done = sum(s[2] for s in state)
+    if done:
+        print(f"  ↻ Resuming {len(state)} segment(s) at {done / (1024 * 1024):.1f} MB")
+    elif len(state) > 1:
+        print(f"  Downloading in {len(state)} segments of {(state[0][1] + 1) / (1024 * 1024):.1f} MB")
+
+    lock = threading.Lock()
+    segment_read = [s[2] for s in state]
+    completed = [s[2] > s[1] - s[0] for s in state]
+    tokens = [SegmentToken(token) for _ in state]
+    hedge_tokens = {}
+
+    # Spread the ranges over every host serving the file, faster hosts get more
+    stripes = url.hosts.stripe(len(state)) if hasattr(url, 'hosts') else None
+
+    def report(n, chunk_read):
+        with lock:
+            segment_read[n] = max(segment_read[n], chunk_read)
+            total_read = sum(segment_read)
+        if chunk_callback:
+            chunk_callback(total_read, content_size)
+
+    def finish_segment(n, winner):
+        """Mark segment n complete and stop the other request, False if that one already won"""
+        with lock:
+            if completed[n]:
+                return False
+            completed[n] = True
+            start, end = state[n][:2]
+            state[n][2] = segment_read[n] = end - start + 1
+            save_segment_state(file_path, content_size, state)
+        loser = hedge_tokens.get(n) if winner is tokens[n] else tokens[n]
+        if loser is not None:
+            loser.superseded = True
+        return True
+
+    def fetch(n):
+        start, end, done = state[n]
+        if start + done > end:
+            return
+        segment_url = url.hosts.path(url.name, preferred=stripes[n]) if stripes else url
+
+        with open(file_path, 'r+b') as f:
+            f.seek(start + done)
+            try:
+                download_with_retry(segment_url, outfile=f, bridge=bridge, chunk_callback=lambda r, t: report(n, r),
+                                    token=tokens[n], max_retries=max_retries, retry_delay=retry_delay,
+                                    limiter=limiter, byte_range=(start + done, end), progress_offset=done,
+                                    settings=settings)
+            finally:
+                f.flush()
+                with lock:
+                    if not completed[n]:
+                        state[n][2] = f.tell() - start
+                        save_segment_state(file_path, content_size, state)
+        if not tokens[n].is_cancelled():
+            finish_segment(n, tokens[n])
+
+    def hedge_fetch(n):
+        start, end = state[n][:2]
+        with lock:
+            offset = start + segment_read[n]
+        hedge_url = url
+        if stripes:
+            others = [b for b in url.hosts.ranked() if b != stripes[n]]
+            hedge_url = url.hosts.path(url.name, preferred=others[0] if others else stripes[n])
+        print(f"  ⚡ Hedging segment {n + 1} from byte {offset}")
+        with open(file_path, 'r+b') as f:
+            f.seek(offset)
+            # Both requests write the same bytes at the same offsets, whichever ends first wins
+            download_with_retry(hedge_url, outfile=f, bridge=bridge, chunk_callback=lambda r, t: report(n, r),
+                                token=hedge_tokens[n], max_retries=max_retries, retry_delay=retry_delay,
+                                limiter=limiter, byte_range=(offset, end), progress_offset=offset - start,
+                                settings=settings)
+            f.flush()
+        if not hedge_tokens[n].is_cancelled() and finish_segment(n, hedge_tokens[n]):
+            print(f"  ⚡ Hedged request finished segment {n + 1} first")
+
+    def slowest_segment(outstanding):
+        """Segment worth a hedged duplicate: the one with the most bytes left"""
+        with lock:
+            left = {n: state[n][1] - state[n][0] + 1 - segment_read[n]
+                    for n in outstanding if not completed[n] and n not in hedge_tokens}
+        if not left:
+            return None
+        n = max(left, key=left.get)
+        return n if left[n] >= HEDGE_MIN_BYTES else None
+
+    errors = {}
+    try:
+        with ThreadPoolExecutor(max_workers=len(state) * (2 if hedge else 1)) as executor:
+            pending = {executor.submit(fetch, n): n for n in range(len(state))}
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    n = pending.pop(future)
+                    try:
+                        future.result()
+                    except RangeNotSupportedError:
+                        raise
+                    except Exception as e:
+                        errors.setdefault(n, e)
+                # Near the end, duplicate the straggler on another connection
+                if hedge and not is_cancelled(token) and len(set(pending.values())) < len(state):
+                    n = slowest_segment(set(pending.values()))
+                    if n is not None:
+                        hedge_tokens[n] = SegmentToken(token)
+                        pending[executor.submit(hedge_fetch, n)] = n
+    except RangeNotSupportedError:
+        print(f"  ⚠ Server ignored Range requests, falling back to a single stream")
+        return single_stream()
+
+    for n, e in errors.items():
+        if not completed[n]:
+            raise e
+
+    if is_cancelled(token):
+        return None
+
+    missing = sum(end - start + 1 - done for start, end, done in state)
+    actual_size = os.path.getsize(file_path)
+    if missing or actual_size != content_size:
+        raise IOError(f"Segmented download incomplete: {missing} bytes missing, size {actual_size} != {content_size}")
+    os.remove(part_path)
+    return True
+
+
+def load_titlekey(game_dir, tmd_data):
+    """Decrypt the title key from title.tik for streaming decryption, None if unavailable"""
+    try:
+        import wiiu_decryptor
+    except ImportError as e:
+        print(f"⚠ Could not import wiiu_decryptor: {e}")
+        return None
+
+    if not wiiu_decryptor.AES_AVAILABLE:
+        return None
+
+    encrypted_titlekey = wiiu_decryptor.get_encrypted_titlekey(os.path.join(game_dir, 'title.tik'))
+    if not encrypted_titlekey:
+        return None
+
+    try:
+        return wiiu_decryptor.decrypt_titlekey(encrypted_titlekey, tmd_data[0x18C:0x194])
+    except Exception as e:
+        print(f"⚠ Could not decrypt title key: {e}")
+        return None
+
+
+def fetch_h3(base, content, game_dir, token=None, max_retries=3):
+    """
+    Return the .h3 of a hash-tree content verified against its TMD hash
+
+    A valid <cid>.h3 on disk (from the prefetch stage or an earlier run) is
+    used as is. A downloaded body that does not match the TMD counts as a
+    failed attempt and is fetched again, from another host if possible.
+
+    Returns None if cancelled
+    """
+    content_id, content_hash = content[0], content[4]
+    h3_path = os.path.join(game_dir, content_id + '.h3')
+    if os.path.exists(h3_path):
+        with open(h3_path, 'rb') as f:
+            h3_hashes = f.read()
+        if hashlib.sha1(h3_hashes).digest() == content_hash:
+            return h3_hashes
+
+    def attempt(n, current):
+        data = download(current, token=token)
+        if data is not None and hashlib.sha1(data).digest() != content_hash:
+            raise IOError(f"{content_id}.h3 does not match the TMD hash")
+        return data
+
+    h3_hashes = wiiu_retry.get_policy().run(content_url(base, content_id + '.h3'), attempt,
+                                            max_retries=max_retries, base_delay=1)
+    if h3_hashes is None:
+        return None
+    with open(h3_path + '.tmp', 'wb') as f:
+        f.write(h3_hashes)
+    os.replace(h3_path + '.tmp', h3_path)
+    return h3_hashes
+
+
+def prefetch_metadata(base, contents, game_dir, fetch_ticket=None, token=None, workers=DEFAULT_PREFETCH_WORKERS):
+    """
+    Fetch the small files of a title concurrently once its TMD is parsed
+
+    fetch_ticket (a callable getting or generating title.tik) runs alongside
+    fetch_h3() for every hash-tree content, so their round trips overlap
+    instead of queueing up in front of each content download.
+
+    Returns (fetch_ticket result, content IDs whose .h3 could not be fetched)
+    """
+    h3_contents = [c for c in contents if c[1] & 0x2]
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, min(int(workers), len(h3_contents) + 1))) as executor:
+        ticket_future = executor.submit(fetch_ticket) if fetch_ticket else None
+        futures = {executor.submit(fetch_h3, base, c, game_dir, token): c[0] for c in h3_contents}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"  ⚠ Hash file {futures[future]}.h3 failed: {e}")
+                failed.append(futures[future])
+        ticket = ticket_future.result() if ticket_future else None
+    if h3_contents:
+        print(f"✓ Prefetched {len(h3_contents) - len(failed)}/{len(h3_contents)} hash file(s)")
+    return ticket, failed
+
+
+def download_decrypt_content(base, content, game_dir, titlekey, bridge=None, chunk_callback=None, token=None,
+                             printprogress=True, router=None, limiter=None, settings=None):
+    """
+    Download one content and decrypt it on the fly into <cid>.app.dec
+
+    The encrypted .app is never written to disk. For hash-tree contents the
+    .h3 file is fetched first so every block can be verified as it arrives.
+    With a wiiu_extract.ContentFileRouter the decrypted bytes go straight
+    into the extracted files instead of a .app.dec.
+
+    Returns True when the decrypted content verified, None if cancelled
+    """
+    import wiiu_decryptor
+
+    content_id, content_type, content_size, content_index, content_hash = content
+
+    h3_hashes = b''
+    if content_type & 0x2:
+        try:
+            h3_hashes = fetch_h3(base, content, game_dir, token) or b''
+        except Exception as e:
+            print(f"  ⚠ Hash file failed, hash tree will not be verified: {e}")
+
+    output_path = os.path.join(game_dir, content_id + '.app.dec')
+    output = router if router is not None else open(output_path, 'wb')
+    verified = False
+    try:
+        decryptor = wiiu_decryptor.ContentStreamDecryptor(
+            titlekey, content_id, content_index, content_type, content_hash, output, h3_hashes)
+        download_with_retry(
+            content_url(base, content_id),
+            printprogress=printprogress,
+            outfile=decryptor,
+            message_prefix='  Progress:',
+            message_suffix='bytes',
+            bridge=bridge,
+            chunk_callback=chunk_callback,
+            token=token,
+            max_retries=3,
+            retry_delay=1,
+            limiter=limiter,
+            settings=settings
+        )
+        if is_cancelled(token):
+            return None
+
+        if not decryptor.finish():
+            for problem in decryptor.problems[:5]:
+                print(f"  ⚠ {problem}")
+            raise IOError(f"{content_id} failed verification ({len(decryptor.problems)} problems)")
+        verified = True
+    finally:
+        # A half-decrypted content cannot be resumed, cancelled or failed outputs are removed
+        if verified:
+            output.close()
+        elif router is not None:
+            router.discard()
+        else:
+            output.close()
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
+    h3_path = os.path.join(game_dir, content_id + '.h3')
+    if router is not None and os.path.exists(h3_path):
+        # Only the extracted files are kept
+        os.remove(h3_path)
+    print(f"  ✓ Decrypted and verified {content_id}")
+    return True
+
+
+def download_content(base, index, content, game_dir, progress, bridge=None, token=None, printprogress=True,
+                     segments=DEFAULT_SEGMENTS, min_segment_size=DEFAULT_MIN_SEGMENT_SIZE, titlekey=None, router=None,
+                     limiter=None, hedge=False, store=None, settings=None):
+    """
+    Download one .app content (and its .h3 hash file when required)
+
+    With a decrypted titlekey the content is decrypted while it downloads
+    and only <cid>.app.dec is written, or only the extracted files when a
+    ContentFileRouter is given. A wiiu_store.TitleContentStore `store` is
+    looked up before downloading and receives every downloaded content.
+
+    Returns True on success, False on failure and None if cancelled
+    """
+    content_id, content_type, content_size = content[:3]
+
+    if is_cancelled(token):
+        return None
+
+    file_size_mb = content_size / (1024 * 1024)
+    file_msg = f"File {index+1}/{progress.total_files}: {content_id}.app ({file_size_mb:.1f} MB)"
+    progress.start_file(content_id, file_msg)
+    print(f"[{index+1}/{progress.total_files}] {file_msg}")
+
+    if titlekey is not None:
+        dec_path = os.path.join(game_dir, content_id + '.app.dec')
+        if router is None and os.path.exists(dec_path) and os.path.getsize(dec_path) == content_size:
+            print(f"  ✓ Already downloaded and decrypted")
+            progress.complete_file(content_id, content_size)
+            return True
+        try:
+            callback = progress.make_callback(content_id, content_size) if bridge else None
+            if download_decrypt_content(base, content, game_dir, titlekey, bridge, callback, token, printprogress,
+                                        router, limiter, settings) is None:
+                return None
+        except Exception as e:
+            print(f"  ✗ Failed {content_id}: {e}")
+            progress.fail_file(content_id)
+            return False
+        progress.complete_file(content_id, content_size)
+        return True
+
+    # Check if file already exists with correct size (a .part file marks an unfinished segmented download)
+    file_path = os.path.join(game_dir, content_id + '.app')
+    part_path = file_path + '.part'
+    if os.path.exists(file_path) and os.path.getsize(file_path) == content_size and not os.path.exists(part_path):
+        print(f"  ✓ Already downloaded")
+        progress.complete_file(content_id, content_size)
+        return True
+
+    h3_path = os.path.join(game_dir, content_id + '.h3') if content_type & 0x2 else None
+    if store is not None and store.fetch(content, file_path, h3_path):
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        progress.complete_file(content_id, content_size)
+        return True
+
+    # Download the .app file
+    try:
+        callback = progress.make_callback(content_id, content_size) if bridge else None
+
+        # Preallocated contents resume through their .part state even when they are not split
+        if os.path.exists(part_path) or (segments > 1 and content_size >= 2 * min_segment_size):
+            download_segmented(
+                content_url(base, content_id),
+                file_path,
+                content_size,
+                segments=segments,
+                min_segment_size=min_segment_size,
+                bridge=bridge,
+                chunk_callback=callback,
+                token=token,
+                limiter=limiter,
+                hedge=hedge,
+                settings=settings
+            )
+        else:
+            download_resumable(
+                content_url(base, content_id),
+                file_path,
+                content_size,
+                printprogress=printprogress,
+                message_prefix='  Progress:',
+                message_suffix='bytes',
+                bridge=bridge,
+                chunk_callback=callback,
+                token=token,
+                max_retries=3,
+                retry_delay=1,
+                limiter=limiter,
+                settings=settings
+            )
+
+        if is_cancelled(token):
+            return None
+
+    except Exception as e:
+        print(f"  ✗ Failed {content_id}: {e}")
+        # Keep the partial file so the next run resumes from it
+        progress.fail_file(content_id)
+        return False
+
+    # Download .h3 file if the prefetch stage did not get it
+    h3_ok = True
+    if content_type & 0x2:
+        try:
+            fetch_h3(base, content, game_dir, token)
+        except Exception as e:
+            print(f"  ⚠ Hash file failed: {e}")
+            h3_ok = False
+            # Non-critical, continue
+
+    if store is not None and h3_ok:
+        # Every later run links the stored bytes, so only verified ones go in
+        if store.titlekey is None:
+            print(f"  ⚠ Title key unavailable, {content_id} not added to the content store")
+        elif verify_content(content, file_path, store.titlekey, h3_path):
+            store.add(content, file_path, h3_path)
+        else:
+            print(f"  ⚠ {content_id} does not match its TMD hashes, not added to the content store")
+
+    progress.complete_file(content_id, content_size)
+    return True
+
+
+def download_contents(base, contents, game_dir, bridge=None, token=None, max_workers=DEFAULT_DOWNLOAD_THREADS,
+                      segments=DEFAULT_SEGMENTS, min_segment_size=DEFAULT_MIN_SEGMENT_SIZE, titlekey=None,
+                      routers=None, progress=None, executor=None, limiter=None, hedge=False, store=None,
+                      settings=None):
+    """
+    Download all content files with a bounded pool of worker threads
+
+    Contents are scheduled largest-first so the big files start early and
+    the small ones fill the gaps at the end. Contents of at least twice
+    `min_segment_size` are themselves split into `segments` byte ranges.
+    Passing the decrypted titlekey decrypts every content while it downloads,
+    and `routers` (content ID -> ContentFileRouter) extracts it on the fly.
+    A shared `executor` schedules the contents of several titles together,
+    `limiter` (a wiiu_ratelimit.Throttle) paces every read and `hedge`
+    duplicates the slowest byte range of a segmented content near its end.
+    A `store` (wiiu_store.TitleContentStore) supplies contents downloaded before.
+
+    Returns (progress, failed_files, cancelled)
+    """
+    total_files = len(contents)
+    total_size = sum(c[2] for c in contents)
+    if progress is None:
+        progress = ContentProgress(bridge, total_files, total_size)
+    failed_files = []
+    cancelled = False
+
+    max_workers = max(1, min(int(max_workers or 1), total_files or 1))
+    # Console progress lines would interleave between workers
+    printprogress = max_workers == 1
+
+    order = sorted(range(total_files), key=lambda i: contents[i][2], reverse=True)
+    print(f"Downloading with {max_workers} parallel connection(s)")
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            executor.submit(download_content, base, i, contents[i], game_dir, progress,
+                            bridge, token, printprogress, segments, min_segment_size, titlekey,
+                            routers.get(contents[i][0]) if routers else None, limiter, hedge, store,
+                            settings): contents[i][0]
+            for i in order
+        }
+        for future in as_completed(futures):
+            result = future.result() if not future.cancelled() else None
+            if result is False:
+                failed_files.append(futures[future])
+            elif result is None and not cancelled:
+                cancelled = True
+                # Drop queued contents, running workers stop on their next chunk
+                for pending in futures:
+                    pending.cancel()
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    if cancelled or is_cancelled(token):
+        print("\nDownload cancelled by user")
+        progress.cancel()
+        cancelled = True
+
+    return progress, failed_files, cancelled
+
+
+def download_extract_contents(base, contents, game_dir, titlekey, bridge=None, token=None,
+                              max_workers=DEFAULT_DOWNLOAD_THREADS, executor=None, limiter=None, settings=None):
+    """
+    Stream every content from the CDN through decryption into the extracted files
+
+    Content 0 (the FST) is downloaded and decrypted in memory first and
+    parsed into an offset -> file map. Every other content is then routed
+    into the code/, content/ and meta/ files as it decrypts, so only the
+    final extracted tree is written. Contents no file points into are not
+    downloaded at all.
+
+    Returns (progress, failed_files, cancelled)
+    """
+    import wiiu_decryptor
+    import wiiu_extract
+
+    total_size = sum(c[2] for c in contents)
+    progress = ContentProgress(bridge, len(contents), total_size)
+
+    fst_id, fst_type, fst_size, fst_index, fst_hash = contents[0]
+    progress.start_file(fst_id, f"File 1/{len(contents)}: {fst_id}.app (FST)")
+    print(f"[1/{len(contents)}] Downloading FST {fst_id}.app")
+    fst_output = io.BytesIO()
+    try:
+        decryptor = wiiu_decryptor.ContentStreamDecryptor(
+            titlekey, fst_id, fst_index, fst_type, fst_hash, fst_output)
+        download_with_retry(content_url(base, fst_id), outfile=decryptor, bridge=bridge,
+                            chunk_callback=progress.make_callback(fst_id, fst_size) if bridge else None,
+                            token=token, max_retries=3, retry_delay=1, limiter=limiter, settings=settings)
+        if is_cancelled(token):
+            progress.cancel()
+            return progress, [], True
+        if not decryptor.finish():
+            raise IOError(f"FST failed verification: {', '.join(decryptor.problems[:3])}")
+        dirs, files = wiiu_extract.parse_fst(fst_output.getvalue())
+    except Exception as e:
+        print(f"  ✗ Failed to read FST {fst_id}: {e}")
+        progress.fail_file(fst_id)
+        return progress, [fst_id], False
+    progress.complete_file(fst_id, fst_size)
+    print(f"  ✓ FST lists {len(files)} files in {len(dirs)} directories")
+
+    for d in dirs:
+        os.makedirs(os.path.join(game_dir, d), exist_ok=True)
+
+    files_by_content = {}
+    for entry in files:
+        if entry[1] < len(contents):
+            files_by_content.setdefault(entry[1], []).append(entry)
+        else:
+            print(f"  ⚠ {entry[0]} points at missing content index {entry[1]}")
+
+    # Files stored inside the FST content itself
+    if files_by_content.get(0):
+        router = wiiu_extract.ContentFileRouter(game_dir, files_by_content[0], fst_type & 2)
+        router.write(fst_output.getvalue())
+        router.close()
+
+    routers = {}
+    remaining = []
+    for i, content in enumerate(contents[1:], start=1):
+        if files_by_content.get(i):
+            routers[content[0]] = wiiu_extract.ContentFileRouter(game_dir, files_by_content[i], content[1] & 2)
+            remaining.append(content)
+        else:
+            print(f"  Skipping {content[0]}.app, no files point into it")
+            progress.complete_file(content[0], content[2])
+
+    progress, failed_files, cancelled = download_contents(
+        base, remaining, game_dir, bridge, token, max_workers=max_workers,
+        titlekey=titlekey, routers=routers, progress=progress, executor=executor, limiter=limiter,
+        settings=settings)
+    return progress, failed_files, cancelled
 
 
 def run_decryptor(game_dir, bridge=None, token=None, delete_encrypted=False):
@@ -117,7 +1005,6 @@ def run_decryptor(game_dir, bridge=None, token=None, delete_encrypted=False):
         if hasattr(wiiu_decryptor, 'main'):
             print(f"Calling wiiu_decryptor.main() directly...")
             
-            import sys
             original_argv = sys.argv
             
             try:
@@ -211,6 +1098,7 @@ def run_decryptor(game_dir, bridge=None, token=None, delete_encrypted=False):
         line_count = 0
         total_files = 0
         current_file = 0
+        current_content = None
         
         for line in process.stdout:
             line = line.strip()
@@ -218,7 +1106,7 @@ def run_decryptor(game_dir, bridge=None, token=None, delete_encrypted=False):
                 continue
             
             # Check for cancellation
-            if token and hasattr(token, 'is_cancelled') and token.is_cancelled():
+            if is_cancelled(token):
                 process.terminate()
                 print("Decryption cancelled by user")
                 if bridge:
@@ -233,19 +1121,15 @@ def run_decryptor(game_dir, bridge=None, token=None, delete_encrypted=False):
                 message = line
                 
                 # Extract meaningful parts
-                if "Decrypting" in line and "..." in line:
-                    # Extract content ID
-                    content_match = re.search(r'Decrypting (\w+)\.\.\.', line)
-                    if content_match:
-                        message = f"Decrypting: {content_match.group(1)}"
+                content_match = re.search(r'Decrypting (\w+)\.\.\.', line)
+                if content_match:
+                    # Progress lines repeat the content ID, count each content once
+                    if content_match.group(1) != current_content:
+                        current_content = content_match.group(1)
                         current_file += 1
-                elif "Chunk" in line:
-                    message = line
-                elif "%" in line:
-                    # Progress line - show as is
-                    message = line
-                    
-                    # Try to extract percentage
+                    message = f"Decrypting: {current_content}"
+                if "%" in line:
+                    # Per-content percentage, or the share of contents done when they decrypt in parallel
                     match = re.search(r'(\d+\.\d+)%', line)
                     if match:
                         percent = float(match.group(1))
@@ -254,11 +1138,13 @@ def run_decryptor(game_dir, bridge=None, token=None, delete_encrypted=False):
                         
                         # Also send as regular update for compatibility
                         bridge.update(int(percent), message, current_file, total_files, 0, 0)
+                elif content_match or "Chunk" in line:
+                    pass
                 elif "Title ID:" in line or "Titlekey" in line:
                     continue  # Skip informational lines
-                elif "Found" in line and "files" in line:
+                elif "Content count:" in line or ("Found" in line and "files" in line):
                     # Extract total file count
-                    match = re.search(r'Found (\d+)', line)
+                    match = re.search(r'(?:Content count:|Found) (\d+)', line)
                     if match:
                         total_files = int(match.group(1))
                 elif "Successfully decrypted" in line:
@@ -322,7 +1208,6 @@ def run_extractor(game_dir, bridge=None, token=None):
         if hasattr(wiiu_extract, 'main'):
             print(f"Calling wiiu_extract.main() directly...")
             
-            import sys
             original_argv = sys.argv
             
             try:
@@ -426,7 +1311,7 @@ def run_extractor(game_dir, bridge=None, token=None):
                 continue
             
             # Check for cancellation
-            if token and hasattr(token, 'is_cancelled') and token.is_cancelled():
+            if is_cancelled(token):
                 process.terminate()
                 print("Extraction cancelled by user")
                 if bridge:
@@ -567,10 +1452,24 @@ def make_ticket(title_id, title_key, title_version, fulloutputpath, patch_demo=F
         f.write(tikdata)
 
 
+def download_ticket(title_id, tik_path, bridge=None, token=None, metadata_cache=None):
+    """Download a title's cetk from the CDN into tik_path, through the metadata cache when given"""
+    url = wiiu_hosts.ticket_hosts(title_id).path('cetk')
+    if metadata_cache is not None:
+        data = metadata_cache.fetch(url, token=token)
+        with open(tik_path, 'wb') as f:
+            f.write(data)
+        return
+    with open(tik_path, 'wb') as f:
+        download_with_retry(url, outfile=f, bridge=bridge, token=token)
+
+
 def get_ticket_for_title(title_id, title_key, tmd_data, game_dir, patch_demo=False, patch_dlc=False, 
-                         onlinetickets=False, bridge=None, token=None):
+                         onlinetickets=False, bridge=None, token=None, metadata_cache=None):
     """
     Get ticket using FunKiiU logic - either download from CDN or generate
+
+    A wiiu_metacache.MetadataCache `metadata_cache` answers repeated cetk downloads.
     
     Returns True if ticket was successfully obtained, False otherwise
     """
@@ -583,15 +1482,13 @@ def get_ticket_for_title(title_id, title_key, tmd_data, game_dir, patch_demo=Fal
     typecheck = title_id[4:8]
     
     # For updates (000e), get ticket from Nintendo CDN
-    if typecheck == '000e':
+    if typecheck.lower() == '000e':
         if bridge:
             bridge.update(10, "Getting update ticket from Nintendo...", 0, 0, 0, 0)
         
         print(f"  This is an update, getting ticket from Nintendo")
-        baseurl = 'http://ccs.cdn.c.shop.nintendowifi.net/ccs/download/' + title_id.lower()
         try:
-            with open(tik_path, 'wb') as f:
-                download_with_retry(baseurl + '/cetk', False, f, bridge=bridge, token=token)
+            download_ticket(title_id, tik_path, bridge, token, metadata_cache)
             print(f"  ✓ Downloaded update ticket from Nintendo")
             return True
         except Exception as e:
@@ -618,10 +1515,8 @@ def get_ticket_for_title(title_id, title_key, tmd_data, game_dir, patch_demo=Fal
         print(f"  ⚠ Trying to download from CDN instead...")
         
         # Try to download from CDN as fallback
-        baseurl = 'http://ccs.cdn.c.shop.nintendowifi.net/ccs/download/' + title_id.lower()
         try:
-            with open(tik_path, 'wb') as f:
-                download_with_retry(baseurl + '/cetk', False, f, bridge=bridge, token=token)
+            download_ticket(title_id, tik_path, bridge, token, metadata_cache)
             print(f"  ✓ Downloaded ticket from CDN")
             return True
         except Exception as e:
@@ -629,9 +1524,85 @@ def get_ticket_for_title(title_id, title_key, tmd_data, game_dir, patch_demo=Fal
             return False
 
 
+def parse_tmd_contents(tmd_data):
+    """Return the content records of a TMD as [content_id, type, size, index, hash]"""
+    contents = []
+    for c in range(struct.unpack('>H', tmd_data[0x1DE:0x1E0])[0]):
+        offset = 0xB04 + 0x30 * c
+        contents.append([
+            # content_id
+            binascii.hexlify(tmd_data[offset:offset + 0x4]).decode('utf-8'),
+            # content_type
+            struct.unpack('>H', tmd_data[offset + 0x6:offset + 0x8])[0],
+            # content_size
+            struct.unpack('>Q', tmd_data[offset + 0x8:offset + 0x10])[0],
+            # content_index
+            tmd_data[offset + 0x4:offset + 0x6],
+            # content_hash
+            tmd_data[offset + 0x10:offset + 0x24],
+        ])
+    return contents
+
+
+def h3_size(content_size):
+    """Size of the .h3 file of a hash-tree content: one SHA-1 per 4096 blocks of 0x10000 bytes"""
+    return 20 * -(-content_size // H3_GROUP_SIZE)
+
+
+def load_titlekeys_data(work_dir, game_dir=None):
+    """
+    Find and load titlekeys.json
+
+    Returns the list of title entries, or None if no readable file was found
+    """
+    titlekeys_file = None
+
+    # Check multiple locations for titlekeys.json
+    possible_paths = [
+        'titlekeys.json',  # Current working directory
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'titlekeys.json'),  # Script directory
+        os.path.join(work_dir, 'titlekeys.json'),  # Work directory
+    ]
+    if game_dir:
+        possible_paths.append(os.path.join(game_dir, 'titlekeys.json'))  # Game directory
+    possible_paths += [
+        os.path.join(work_dir, '..', 'titlekeys.json'),  # Parent of work directory
+        os.path.join(os.getcwd(), 'titlekeys.json'),  # Current working directory (alternative)
+    ]
+
+    # Try each location in order
+    for path in possible_paths:
+        if os.path.exists(path):
+            titlekeys_file = path
+            print(f"Found titlekeys.json at: {path}")
+            break
+
+    if not titlekeys_file:
+        print("⚠ titlekeys.json not found in any standard location")
+        return None
+
+    try:
+        with open(titlekeys_file, 'r') as f:
+            titlekeys_data = json.load(f)
+        print(f"Loaded {len(titlekeys_data)} titles from {os.path.basename(titlekeys_file)}")
+        return titlekeys_data
+    except Exception as e:
+        print(f"⚠ Could not read titlekeys.json: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
 def main_with_progress(title_id: str, work_dir: str, provider_root_doc_uri=None, bridge=None, token=None, 
                        auto_decrypt=True, delete_encrypted=False, auto_extract=True, 
-                       patch_demo=True, patch_dlc=True) -> str:
+                       patch_demo=True, patch_dlc=True, download_threads=DEFAULT_DOWNLOAD_THREADS,
+                       segments=DEFAULT_SEGMENTS, min_segment_size=DEFAULT_MIN_SEGMENT_SIZE,
+                       stream_decrypt=False, stream_extract=False, engine='threads',
+                       titlekeys_data=None, executor=None, rate_limit=None, hedge=False, store_dir=None,
+                       store_max_bytes=wiiu_store.DEFAULT_MAX_BYTES, metadata_cache_dir=None,
+                       metadata_ttl=wiiu_metacache.DEFAULT_TTL, preallocate_files=True,
+                       read_size=DEFAULT_READ_SIZE, stall_timeout=DEFAULT_STALL_TIMEOUT,
+                       min_throughput=DEFAULT_MIN_THROUGHPUT, async_engine=None) -> str:
     """
     Download WiiU game content from CDN with detailed progress tracking
     
@@ -646,11 +1617,37 @@ def main_with_progress(title_id: str, work_dir: str, provider_root_doc_uri=None,
         auto_extract: Whether to automatically extract after decryption
         patch_demo: Whether to patch demo play limit (from FunKiiU)
         patch_dlc: Whether to patch DLC content (from FunKiiU)
+        download_threads: Number of content files to download in parallel
+        segments: Maximum number of parallel byte ranges per large content file (1 disables segmenting)
+        min_segment_size: Minimum size in bytes of one byte range
+        stream_decrypt: Decrypt contents while downloading instead of writing encrypted .app files first
+        stream_extract: Decrypt and extract contents while downloading so only the extracted files are written
+        engine: 'threads' for the thread pool downloader, 'asyncio' to run every fetch on one event loop
+        titlekeys_data: Already loaded titlekeys.json entries, loaded from disk when None
+        executor: Shared ThreadPoolExecutor for content downloads (batch downloads)
+        rate_limit: Bandwidth limit of this title in bytes per second, adjustable later with
+            wiiu_ratelimit.set_title_rate (the global limit is wiiu_ratelimit.set_global_rate)
+        hedge: Request the slowest byte range of a segmented content twice near its end, first one wins
+        store_dir: Directory of a content store shared between work directories, downloaded .app files
+            are linked from it instead of fetched again (None disables the store)
+        store_max_bytes: Size cap of the content store, least recently used contents are evicted
+        metadata_cache_dir: Directory caching tmd and cetk downloads (defaults to work_dir/.metadata)
+        metadata_ttl: Seconds a cached tmd or cetk is used before it is revalidated with the CDN
+        preallocate_files: Reserve every .app at its full size before downloading (thread engine);
+            the free space is checked either way
+        read_size: Bytes requested from the socket per read
+        stall_timeout: Seconds without data before a connection is reopened
+        min_throughput: Bytes per second a connection must sustain, not counting rate limit waits (0 disables)
+        async_engine: wiiu_async.AsyncEngine shared with other titles (engine='asyncio'), a title
+            without one runs its contents on its own event loop
     
     Returns:
         Path to the downloaded (and possibly decrypted/extracted) game directory
     """
     
+    # Read loops check cancellation per chunk, only ask Kotlin a few times a second
+    token = cancel_mirror(token)
+
     # Initial setup and validation
     if bridge:
         # Send initial progress with file count 0/0
@@ -673,73 +1670,44 @@ def main_with_progress(title_id: str, work_dir: str, provider_root_doc_uri=None,
         print(f"Downloading to SAF URI: {provider_root_doc_uri}")
     print(f"Temporary download directory: {game_dir}")
     
-    # Determine base URL
-    sysbase = 'http://nus.cdn.wup.shop.nintendo.net/ccs/download/' + tid
-    appbase = 'http://ccs.cdn.wup.shop.nintendo.net/ccs/download/' + tid
-    
-    base = appbase
-    if tid[4:8] not in app_categories:
-        base = sysbase
+    # Every CDN host serving the title, the usual one (app or system) first
+    base = wiiu_hosts.title_hosts(tid, app_categories)
+    metadata_cache = wiiu_metacache.get_cache(metadata_cache_dir or os.path.join(work_dir, '.metadata'),
+                                              metadata_ttl)
     
     # PHASE 1: Download metadata files (0-25%)
     if bridge:
         bridge.update(5, "Downloading metadata...", 0, 0, 0, 0)
     
     # Try to get titlekeys.json first (for title key lookup)
-    titlekeys_file = None
     title_data = None
     title_key = None
+    titlekeys_name = 'titlekeys.json'
 
-    # Check multiple locations for titlekeys.json
-    possible_paths = [
-        'titlekeys.json',  # Current working directory
-        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'titlekeys.json'),  # Script directory
-        os.path.join(work_dir, 'titlekeys.json'),  # Work directory
-        os.path.join(game_dir, 'titlekeys.json'),  # Game directory
-        os.path.join(work_dir, '..', 'titlekeys.json'),  # Parent of work directory
-        os.path.join(os.getcwd(), 'titlekeys.json'),  # Current working directory (alternative)
-    ]
+    if titlekeys_data is None:
+        titlekeys_data = load_titlekeys_data(work_dir, game_dir)
 
-    # Try each location in order
-    for path in possible_paths:
-        if os.path.exists(path):
-            titlekeys_file = path
-            print(f"Found titlekeys.json at: {path}")
-            break
+    if titlekeys_data is not None:
+        # Convert both to lowercase for case-insensitive matching
+        tid_lower = tid.lower()
+        print(f"Looking for title ID: {tid_lower}")
 
-    # Check if we have titlekeys.json locally
-    if titlekeys_file and os.path.exists(titlekeys_file):
-        try:
-            with open(titlekeys_file, 'r') as f:
-                titlekeys_data = json.load(f)
-                print(f"Loaded {len(titlekeys_data)} titles from {os.path.basename(titlekeys_file)}")
-                
-                # Convert both to lowercase for case-insensitive matching
-                tid_lower = tid.lower()
-                print(f"Looking for title ID: {tid_lower}")
-                
-                title_data = next((t for t in titlekeys_data if t['titleID'].lower() == tid_lower), None)
-                if title_data:
-                    title_key = title_data.get('titleKey')
-                    print(f"✓ Found title key in {os.path.basename(titlekeys_file)}")
-                    print(f"  Title: {title_data.get('name', 'Unknown')}")
-                    print(f"  Region: {title_data.get('region', 'Unknown')}")
-                    ticket_flag = title_data.get('ticket')
-                    print(f"  Ticket flag: {ticket_flag} (type: {type(ticket_flag)})")
-                    
-                    # Debug: print the actual title key
-                    if title_key:
-                        print(f"  Title key: {title_key}")
-                    else:
-                        print(f"  ⚠ No title key found for this title")
-                else:
-                    print(f"⚠ Title ID {tid_lower} not found in {os.path.basename(titlekeys_file)}")
-        except Exception as e:
-            print(f"⚠ Could not read titlekeys.json: {e}")
-            import traceback
-            traceback.print_exc()
-    else:
-        print("⚠ titlekeys.json not found in any standard location")
+        title_data = next((t for t in titlekeys_data if t['titleID'].lower() == tid_lower), None)
+        if title_data:
+            title_key = title_data.get('titleKey')
+            print(f"✓ Found title key in {titlekeys_name}")
+            print(f"  Title: {title_data.get('name', 'Unknown')}")
+            print(f"  Region: {title_data.get('region', 'Unknown')}")
+            ticket_flag = title_data.get('ticket')
+            print(f"  Ticket flag: {ticket_flag} (type: {type(ticket_flag)})")
+
+            # Debug: print the actual title key
+            if title_key:
+                print(f"  Title key: {title_key}")
+            else:
+                print(f"  ⚠ No title key found for this title")
+        else:
+            print(f"⚠ Title ID {tid_lower} not found in {titlekeys_name}")
     
     # Download TMD first
     if bridge:
@@ -747,18 +1715,18 @@ def main_with_progress(title_id: str, work_dir: str, provider_root_doc_uri=None,
     
     tmd_path = os.path.join(game_dir, 'title.tmd')
     try:
-        tmd_data = download_with_retry(base + '/tmd', bridge=bridge, token=token)
+        tmd_data = metadata_cache.fetch(content_url(base, 'tmd'), token=token)
+    except wiiu_metacache.FetchCancelled:
+        print("\nDownload cancelled by user")
+        if bridge:
+            bridge.update(0, "Download cancelled", 0, 0, 0, 0)
+        return ""
     except Exception as e:
         print(f"Failed to download TMD: {e}")
         if bridge:
             bridge.update(0, f"Failed to download TMD: {e}", 0, 0, 0, 0)
         return ""
     
-    # Get ticket using FunKiiU logic
-    if not get_ticket_for_title(tid, title_key, tmd_data, game_dir, patch_demo, patch_dlc, False, bridge, token):
-        print(f"⚠ Could not get ticket for title {tid}")
-        print(f"⚠ Decryption will require manual ticket placement")
-    
     # Parse TMD to get content list
     contents = []
     total_files = 0
@@ -771,15 +1739,7 @@ def main_with_progress(title_id: str, work_dir: str, provider_root_doc_uri=None,
         else:
             print(f"Found {total_files} content files")
         
-        for c in range(total_files):
-            contents.append([
-                # content_id
-                binascii.hexlify(tmd_data[0xB04 + (0x30 * c):0xB04 + (0x30 * c) + 0x4]).decode('utf-8'),
-                # content_type
-                struct.unpack('>H', tmd_data[0xB0A + (0x30 * c):0xB0A + (0x30 * c) + 0x2])[0],
-                # content_size
-                struct.unpack('>Q', tmd_data[0xB0C + (0x30 * c):0xB0C + (0x30 * c) + 0x8])[0],
-            ])
+        contents = parse_tmd_contents(tmd_data)
         
         # Save TMD
         with open(tmd_path, 'wb') as f:
@@ -790,6 +1750,18 @@ def main_with_progress(title_id: str, work_dir: str, provider_root_doc_uri=None,
         if bridge:
             bridge.update(0, f"Error parsing TMD: {e}", 0, total_files, 0, 0)
         return ""
+
+    # Get the ticket (FunKiiU logic) and every .h3 together, they are small but each costs a round trip
+    if bridge:
+        bridge.update(22, "Fetching ticket and hash files...", 0, total_files, 0, 0)
+    ticket_ok, _ = prefetch_metadata(
+        base, contents, game_dir,
+        lambda: get_ticket_for_title(tid, title_key, tmd_data, game_dir, patch_demo, patch_dlc, False, None, token,
+                                     metadata_cache),
+        token)
+    if not ticket_ok:
+        print(f"⚠ Could not get ticket for title {tid}")
+        print(f"⚠ Decryption will require manual ticket placement")
     
     # Calculate total size for progress (in MB)
     total_size = sum(c[2] for c in contents)
@@ -823,136 +1795,66 @@ def main_with_progress(title_id: str, work_dir: str, provider_root_doc_uri=None,
     print(f"DOWNLOADING {total_files} CONTENT FILES")
     print(f"{'='*60}\n")
     
-    downloaded_size = 0
-    downloaded_size_mb = 0
-    successful_files = 0
-    failed_files = []
-    
-    # Calculate progress weight for each file based on size
-    file_weights = [(c[2] / total_size) * 65 if total_size > 0 else 0 for c in contents]
-    
-    for i, (content_id, content_type, content_size) in enumerate(contents):
-        # Check cancellation
-        if token and hasattr(token, 'is_cancelled') and token.is_cancelled():
-            print("\nDownload cancelled by user")
-            if bridge:
-                bridge.update(0, "Download cancelled", successful_files, total_files, downloaded_size_mb, total_size_mb)
-            return game_dir  # Return partial download
-        
-        # Calculate overall progress percentage
-        progress_percent = 30 + sum(file_weights[:i]) * 100
-        
-        # Update bridge for file start WITH FILE COUNT and MB
-        file_size_mb = content_size / (1024 * 1024)
-        file_msg = f"File {i+1}/{total_files}: {content_id}.app ({file_size_mb:.1f} MB)"
+    titlekey = None
+    streamed_extract = False
+    if (stream_decrypt or stream_extract) and auto_decrypt:
+        titlekey = load_titlekey(game_dir, tmd_data)
+        if titlekey is not None:
+            streamed_extract = stream_extract and auto_extract
+            print(f"Decrypting {'and extracting ' if streamed_extract else ''}contents while downloading")
+        else:
+            print(f"⚠ Title key unavailable, downloading encrypted contents instead")
+
+    if rate_limit is not None:
+        wiiu_ratelimit.set_title_rate(tid, rate_limit)
+    wiiu_ratelimit.get_title_limiter(tid).reset_stats()
+    limiter = wiiu_ratelimit.title_throttle(tid)
+    settings = TransferSettings(read_size, stall_timeout, min_throughput)
+
+    store = None
+    if store_dir:
+        store = wiiu_store.get_store(store_dir, store_max_bytes).for_title(tid, load_titlekey(game_dir, tmd_data))
+        if titlekey is not None or engine == 'asyncio':
+            print(f"⚠ The content store is only used when encrypted contents are downloaded on the thread engine")
+
+    # Fail now rather than hours into the download when the title does not fit
+    try:
+        reserved = reserve_contents(contents, game_dir, segments, min_segment_size,
+                                    allocate=preallocate_files and titlekey is None and engine != 'asyncio',
+                                    store=store if titlekey is None and engine != 'asyncio' else None)
+        if reserved:
+            print(f"Reserved {reserved / (1024 * 1024):.1f} MB of disk space")
+    except OSError as e:
+        print(f"❌ Cannot reserve disk space: {e}")
         if bridge:
-            # Send current file index (i) and total files, with MB values
-            bridge.update(int(progress_percent), file_msg, i, total_files, downloaded_size_mb, total_size_mb)
-        
-        print(f"[{i+1}/{total_files}] {file_msg}")
-        
-        # Check if file already exists with correct size
-        file_path = os.path.join(game_dir, content_id + '.app')
-        if os.path.exists(file_path) and os.path.getsize(file_path) == content_size:
-            print(f"  ✓ Already downloaded")
-            downloaded_size += content_size
-            downloaded_size_mb = downloaded_size / (1024 * 1024)
-            successful_files += 1
-            
-            # Update Android with file completion
-            if bridge:
-                next_progress = 30 + sum(file_weights[:i+1]) * 100
-                bridge.update(int(next_progress), f"Completed {content_id}.app", i+1, total_files, downloaded_size_mb, total_size_mb)
-            continue
-        
-        # Download the .app file
-        try:
-            # Create progress callback for this file
-            def make_progress_callback(file_idx, file_id, file_size, file_size_mb, weight, overall_start, bdg, total_files_count, total_size_mb, current_downloaded_mb):
-                file_downloaded = 0
-                def callback(chunk_read, chunk_total):
-                    nonlocal file_downloaded
-                    if bdg and chunk_total > 0:
-                        # Calculate progress within this file
-                        file_progress = (chunk_read / file_size) * weight * 100
-                        current_progress = overall_start + file_progress
-                        
-                        # Calculate downloaded MB for this file
-                        chunk_mb = chunk_read / (1024 * 1024)
-                        # Update total downloaded (we need to subtract previously reported chunks)
-                        total_downloaded_mb = current_downloaded_mb + chunk_mb
-                        
-                        # Update message with MB progress
-                        msg = f"{file_id}.app: {chunk_mb:.1f}/{file_size_mb:.1f} MB"
-                        
-                        # Update bridge with current file index and MB values
-                        # Only update every 5% to avoid too many calls
-                        if int(current_progress) % 5 == 0 or chunk_read == chunk_total:
-                            bdg.update(int(current_progress), msg, file_idx, total_files_count, total_downloaded_mb, total_size_mb)
-                return callback
-            
-            # Set up callback if bridge is provided
-            callback = None
-            if bridge:
-                overall_start = 30 + sum(file_weights[:i]) * 100
-                callback = make_progress_callback(i, content_id, content_size, file_size_mb, file_weights[i], overall_start, bridge, total_files, total_size_mb, downloaded_size_mb)
-            
-            # Download with retry
-            with open(file_path, 'wb') as f:
-                download_with_retry(
-                    base + '/' + content_id,
-                    printprogress=True,
-                    outfile=f,
-                    message_prefix='  Progress:',
-                    message_suffix='bytes',
-                    bridge=bridge,
-                    chunk_callback=callback,
-                    token=token,
-                    max_retries=3,
-                    retry_delay=1
-                )
-            
-            downloaded_size += content_size
-            downloaded_size_mb = downloaded_size / (1024 * 1024)
-            successful_files += 1
-            
-            # Update after successful download
-            if bridge:
-                next_progress = 30 + sum(file_weights[:i+1]) * 100
-                bridge.update(int(next_progress), f"Completed {content_id}.app", i+1, total_files, downloaded_size_mb, total_size_mb)
-            
-        except Exception as e:
-            print(f"  ✗ Failed: {e}")
-            failed_files.append(content_id)
-            # Remove partial file if it exists
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
-            # Still update file count (this file failed)
-            if bridge:
-                bridge.update(int(progress_percent), f"Failed {content_id}.app", i+1, total_files, downloaded_size_mb, total_size_mb)
-            continue
-        
-        # Download .h3 file if required
-        if content_type & 0x2:
-            h3_path = os.path.join(game_dir, content_id + '.h3')
-            try:
-                print(f"  Downloading hash file...")
-                with open(h3_path, 'wb') as f:
-                    download_with_retry(
-                        base + '/' + content_id + '.h3',
-                        printprogress=True,
-                        outfile=f,
-                        message_prefix='  Hash:',
-                        message_suffix='bytes',
-                        bridge=bridge,
-                        token=token,
-                        max_retries=2
-                    )
-            except Exception as e:
-                print(f"  ⚠ Hash file failed: {e}")
-                # Non-critical, continue
-    
+            bridge.update(0, f"Not enough storage: {e.strerror or e}", 0, total_files, 0, total_size_mb)
+        return ""
+
+    if engine == 'asyncio' and titlekey is not None:
+        print(f"⚠ Streaming decryption runs on the thread engine")
+    if engine == 'asyncio' and titlekey is None and async_engine is not None:
+        progress, failed_files, cancelled = async_engine.download_contents(
+            base, contents, game_dir, bridge, token, limiter=limiter, settings=settings)
+    elif engine == 'asyncio' and titlekey is None:
+        import wiiu_async
+        progress, failed_files, cancelled = wiiu_async.run_download_contents(
+            base, contents, game_dir, bridge, token, per_host_limit=max(1, download_threads * segments),
+            limiter=limiter, settings=settings)
+    elif streamed_extract:
+        progress, failed_files, cancelled = download_extract_contents(
+            base, contents, game_dir, titlekey, bridge, token, max_workers=download_threads, executor=executor,
+            limiter=limiter, settings=settings)
+    else:
+        progress, failed_files, cancelled = download_contents(
+            base, contents, game_dir, bridge, token, max_workers=download_threads,
+            segments=segments, min_segment_size=min_segment_size, titlekey=titlekey, executor=executor,
+            limiter=limiter, hedge=hedge, store=store, settings=settings)
+    if cancelled:
+        return game_dir  # Return partial download
+
+    successful_files = progress.successful_files
+    downloaded_size_mb = progress.downloaded_mb()
+
     # PHASE 3: Finalize download (95-100%)
     if bridge:
         bridge.update(95, "Finalizing download...", total_files, total_files, downloaded_size_mb, total_size_mb)
@@ -967,6 +1869,14 @@ def main_with_progress(title_id: str, work_dir: str, provider_root_doc_uri=None,
         print(f"Failed file IDs: {', '.join(failed_files)}")
     print(f"Total downloaded: {downloaded_size_mb:.1f} MB")
     print(f"Download directory: {game_dir}")
+    get_pool().print_stats()
+    download_stats.print_stats()
+    limiter.print_stats()
+    wiiu_retry.get_policy().stats.print_stats()
+    base.print_stats()
+    metadata_cache.print_stats()
+    if store is not None:
+        store.print_stats()
     print(f"{'='*60}")
     
     if failed_files:
@@ -981,10 +1891,17 @@ def main_with_progress(title_id: str, work_dir: str, provider_root_doc_uri=None,
     if successful_files > 0:
         if tik_exists and auto_decrypt:
             print(f"\n✅ Download complete!")
-            print(f"✅ Starting automatic decryption...")
             
-            # Run decryption IN THE SAME DIRECTORY
-            decryption_result = run_decryptor(game_dir, bridge, token, delete_encrypted)
+            if titlekey is not None:
+                # Contents were already decrypted while downloading
+                decryption_result = game_dir
+                if bridge:
+                    bridge.updateDecryptionProgress(100, "Decryption complete")
+            else:
+                print(f"✅ Starting automatic decryption...")
+                
+                # Run decryption IN THE SAME DIRECTORY
+                decryption_result = run_decryptor(game_dir, bridge, token, delete_encrypted)
             
             if decryption_result:
                 # Decryption successful, now check if we should extract
@@ -994,8 +1911,14 @@ def main_with_progress(title_id: str, work_dir: str, provider_root_doc_uri=None,
                     print(f"\n✅ Decryption successful!")
                     print(f"✅ Starting automatic extraction...")
                     
-                    # Run extraction IN THE SAME DIRECTORY
-                    extraction_result = run_extractor(game_dir, bridge, token)
+                    if streamed_extract:
+                        # Files were already extracted while downloading
+                        extraction_result = game_dir if not failed_files else None
+                        if bridge and extraction_result:
+                            bridge.updateExtractionProgress(100, "Extraction complete")
+                    else:
+                        # Run extraction IN THE SAME DIRECTORY
+                        extraction_result = run_extractor(game_dir, bridge, token)
                     
                     if extraction_result:
                         print(f"\n✅ Download, decryption, and extraction complete!")
@@ -1054,6 +1977,546 @@ def main_with_progress(title_id: str, work_dir: str, provider_root_doc_uri=None,
     return final_result_dir
 
 
+# Title ID high words of the update and DLC titles that belong to a game
+UPDATE_TITLE_TYPE = '0005000E'
+DLC_TITLE_TYPE = '0005000C'
+
+# Titles of a batch processed at the same time
+DEFAULT_TITLE_WORKERS = 2
+
+# TMDs fetched at the same time by a pre-flight size check
+DEFAULT_PREFLIGHT_WORKERS = 16
+
+
+def expand_title_ids(title_ids, include_update=True, include_dlc=True):
+    """Return the title IDs of a batch with the update and DLC of every base game added"""
+    result = []
+    for title_id in title_ids:
+        tid = title_id.strip().upper()
+        if not tid:
+            continue
+        candidates = [tid]
+        if tid[:8] == '00050000':
+            if include_update:
+                candidates.append(UPDATE_TITLE_TYPE + tid[8:])
+            if include_dlc:
+                candidates.append(DLC_TITLE_TYPE + tid[8:])
+        for candidate in candidates:
+            if candidate not in result:
+                result.append(candidate)
+    return result
+
+
+class BatchProgress:
+    """
+    Aggregate progress of the titles of a batch
+
+    Every title reports through its own title_bridge(); the real bridge gets
+    the message prefixed with the title and the totals of the whole batch.
+    The totals are kept as running sums, so a report costs the same for a
+    batch of two titles or two hundred.
+    """
+
+    FIELDS = ('percents', 'current_files', 'total_files', 'downloaded_mb', 'total_mb')
+
+    def __init__(self, bridge, title_ids):
+        self.bridge = bridge
+        self.title_ids = title_ids
+        self.lock = threading.Lock()
+        count = len(title_ids)
+        self.percents = [0] * count
+        self.current_files = [0] * count
+        self.total_files = [0] * count
+        self.downloaded_mb = [0.0] * count
+        self.total_mb = [0.0] * count
+        self.sums = dict.fromkeys(self.FIELDS, 0)
+
+    def label(self, index, message):
+        return f"[{index+1}/{len(self.title_ids)} {self.title_ids[index]}] {message}"
+
+    def percent(self):
+        return self.sums['percents'] / len(self.percents) if self.percents else 100
+
+    def _set(self, index, **values):
+        for name, value in values.items():
+            column = getattr(self, name)
+            self.sums[name] += value - column[index]
+            column[index] = value
+
+    def report(self, index, percent, message, current_file, total_files, downloaded_mb, total_mb):
+        with self.lock:
+            self._set(index, percents=percent, current_files=current_file, total_files=total_files,
+                      downloaded_mb=downloaded_mb, total_mb=total_mb)
+            args = (int(self.percent()), self.label(index, message), self.sums['current_files'],
+                    self.sums['total_files'], self.sums['downloaded_mb'], self.sums['total_mb'])
+        if self.bridge:
+            self.bridge.update(*args)
+
+    def finish(self, index, message):
+        with self.lock:
+            self._set(index, percents=100, current_files=self.total_files[index],
+                      downloaded_mb=self.total_mb[index])
+        self.report(index, 100, message, self.current_files[index], self.total_files[index],
+                    self.downloaded_mb[index], self.total_mb[index])
+
+    def title_bridge(self, index):
+        return BatchTitleBridge(self, index) if self.bridge else None
+
+
+class BatchTitleBridge:
+    """Progress bridge handed to main_with_progress for one title of a batch"""
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+
+    def update(self, percent, message, current_file, total_files, downloaded_mb, total_mb):
+        self.batch.report(self.index, percent, message, current_file, total_files, downloaded_mb, total_mb)
+
+    def updateDecryptionProgress(self, percent, message):
+        self.batch.bridge.updateDecryptionProgress(percent, self.batch.label(self.index, message))
+
+    def updateExtractionProgress(self, percent, message):
+        self.batch.bridge.updateExtractionProgress(percent, self.batch.label(self.index, message))
+
+    def __getattr__(self, name):
+        # Anything else (updatePhase...) goes to the real bridge unchanged
+        return getattr(self.batch.bridge, name)
+
+
+def main_batch_with_progress(title_ids, work_dir: str, provider_root_doc_uri=None, bridge=None, token=None,
+                             include_update=True, include_dlc=True, title_workers=DEFAULT_TITLE_WORKERS,
+                             download_threads=DEFAULT_DOWNLOAD_THREADS, total_rate_limit=None, **options) -> dict:
+    """
+    Download several titles as one job
+
+    Args:
+        title_ids: List of title IDs, or a comma separated string
+        work_dir: Directory where the title directories are created
+        provider_root_doc_uri: Optional URI for Android Storage Access Framework (SAF) destination
+        bridge: Progress bridge, receives the aggregate of all titles
+        token: Cancellation token for the whole batch
+        include_update: Add the 0005000E update of every base game (00050000)
+        include_dlc: Add the 0005000C DLC of every base game
+        title_workers: Number of titles processed at the same time
+        download_threads: Content downloads in flight across all titles
+        total_rate_limit: Bandwidth limit of the whole batch in bytes per second (rate_limit limits each title)
+        options: Passed on to main_with_progress (auto_decrypt, segments, ...)
+
+    titlekeys.json is loaded once, and every title shares the connection pool
+    and one content download scheduler. With engine='asyncio' the titles share
+    one event loop and its connection pool instead.
+
+    Returns:
+        Dict of title ID -> game directory ("" if the title failed or is not on the CDN)
+    """
+    token = cancel_mirror(token)
+    if isinstance(title_ids, str):
+        title_ids = title_ids.split(',')
+    tids = expand_title_ids(list(title_ids), include_update, include_dlc)
+    if not tids:
+        if bridge:
+            bridge.update(0, "No title IDs given", 0, 0, 0, 0)
+        return {}
+
+    print(f"Batch of {len(tids)} title(s): {', '.join(tids)}")
+    if total_rate_limit is not None:
+        wiiu_ratelimit.set_global_rate(total_rate_limit)
+    # None (no readable titlekeys.json) lets every title report why it has no title key
+    titlekeys_data = load_titlekeys_data(work_dir)
+    batch = BatchProgress(bridge, tids)
+    results = {}
+    async_engine = None
+    if options.get('engine') == 'asyncio':
+        import wiiu_async
+        async_engine = wiiu_async.AsyncEngine(
+            per_host_limit=max(1, download_threads * options.get('segments', DEFAULT_SEGMENTS)))
+
+    def run_title(index, tid):
+        if is_cancelled(token):
+            return ""
+        result = main_with_progress(tid, work_dir, provider_root_doc_uri, batch.title_bridge(index), token,
+                                    download_threads=download_threads, titlekeys_data=titlekeys_data,
+                                    executor=content_executor, async_engine=async_engine, **options)
+        if not is_cancelled(token):
+            batch.finish(index, "Done" if result else "Not available")
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, int(download_threads))) as content_executor, \
+                ThreadPoolExecutor(max_workers=max(1, int(title_workers))) as title_executor:
+            futures = {title_executor.submit(run_title, i, tid): tid for i, tid in enumerate(tids)}
+            for future in as_completed(futures):
+                tid = futures[future]
+                try:
+                    results[tid] = future.result()
+                except Exception as e:
+                    print(f"✗ {tid} failed: {e}")
+                    results[tid] = ""
+    finally:
+        if async_engine is not None:
+            async_engine.close()
+
+    print(f"\n{'='*60}")
+    print(f"BATCH SUMMARY")
+    print(f"{'='*60}")
+    for tid in tids:
+        print(f"{'✓' if results.get(tid) else '✗'} {tid} {results.get(tid) or ''}")
+    get_pool().print_stats()
+    print(f"{'='*60}")
+
+    if bridge:
+        done = sum(1 for tid in tids if results.get(tid))
+        if is_cancelled(token):
+            bridge.update(int(batch.percent()), "Batch cancelled", done, len(tids), 0, 0)
+        else:
+            bridge.update(100, f"Batch complete: {done}/{len(tids)} titles", done, len(tids), 0, 0)
+    return results
+
+
+def free_disk_space(path):
+    """Free bytes on the file system holding path, which does not have to exist yet"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+
+def title_size(title_id, work_dir, metadata_cache):
+    """
+    Size report of one title from its TMD
+
+    Contents already downloaded to work_dir/<title ID> count as done and
+    are left out of remaining_bytes.
+    """
+    tid = title_id.upper()
+    report = {'title_id': tid, 'available': False, 'contents': 0, 'content_bytes': 0,
+              'h3_files': 0, 'h3_bytes': 0, 'total_bytes': 0, 'remaining_bytes': 0, 'error': None}
+    try:
+        tmd_data = metadata_cache.fetch(content_url(wiiu_hosts.title_hosts(tid, app_categories), 'tmd'))
+        contents = parse_tmd_contents(tmd_data)
+    except HTTPError as e:
+        if e.code != 404:
+            report['error'] = str(e)
+        return report
+    except Exception as e:
+        report['error'] = str(e)
+        return report
+
+    game_dir = os.path.join(work_dir, tid)
+    report['available'] = True
+    report['contents'] = len(contents)
+    for content in contents:
+        content_id, content_type, content_size = content[:3]
+        size = content_size
+        report['content_bytes'] += content_size
+        if content_type & 0x2:
+            report['h3_files'] += 1
+            report['h3_bytes'] += h3_size(content_size)
+            size += h3_size(content_size)
+        app_path = os.path.join(game_dir, content_id + '.app')
+        if not (os.path.exists(app_path) and os.path.getsize(app_path) == content_size
+                and not os.path.exists(app_path + '.part')):
+            report['remaining_bytes'] += size
+    report['total_bytes'] = report['content_bytes'] + report['h3_bytes']
+    return report
+
+
+def preflight(title_ids, work_dir, include_update=True, include_dlc=True, workers=DEFAULT_PREFLIGHT_WORKERS,
+              space_factor=1.0, metadata_cache_dir=None, metadata_ttl=wiiu_metacache.DEFAULT_TTL,
+              bridge=None, token=None) -> dict:
+    """
+    Size a list of titles without downloading any content
+
+    Only the TMDs are fetched, `workers` at a time, through the metadata
+    cache so a later download (or another check) does not fetch them again.
+
+    Args:
+        title_ids: List of title IDs, or a comma separated string
+        work_dir: Directory the titles would be downloaded to, checked for free space
+        include_update: Add the 0005000E update of every base game
+        include_dlc: Add the 0005000C DLC of every base game
+        workers: Number of TMDs fetched at the same time
+        space_factor: Disk bytes needed per downloaded byte (about 2 when decrypting next to
+            the encrypted files, 3 with extraction)
+        bridge: Progress bridge, update() after every title
+        token: Cancellation token
+
+    Returns:
+        Dict with 'titles' (one report per title ID) and the totals of the available titles:
+        titles_available, contents, content_bytes, h3_bytes, total_bytes, remaining_bytes,
+        required_bytes, free_bytes and fits
+    """
+    if isinstance(title_ids, str):
+        title_ids = title_ids.split(',')
+    tids = expand_title_ids(list(title_ids), include_update, include_dlc)
+    metadata_cache = wiiu_metacache.get_cache(metadata_cache_dir or os.path.join(work_dir, '.metadata'),
+                                              metadata_ttl)
+    reports = {}
+    done = 0
+
+    print(f"Pre-flight check of {len(tids)} title(s) with {workers} parallel request(s)")
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as executor:
+        futures = {executor.submit(title_size, tid, work_dir, metadata_cache): tid for tid in tids}
+        for future in as_completed(futures):
+            if is_cancelled(token):
+                for pending in futures:
+                    pending.cancel()
+                break
+            report = future.result()
+            reports[report['title_id']] = report
+            done += 1
+            if bridge:
+                total_mb = sum(r['total_bytes'] for r in reports.values()) / (1024 * 1024)
+                bridge.update(int(done * 100 / len(tids)), f"Checked {report['title_id']}", done, len(tids),
+                              0, total_mb)
+
+    available = [reports[tid] for tid in tids if tid in reports and reports[tid]['available']]
+    result = {
+        'titles': [reports[tid] for tid in tids if tid in reports],
+        'titles_available': len(available),
+        'contents': sum(r['contents'] for r in available),
+        'content_bytes': sum(r['content_bytes'] for r in available),
+        'h3_bytes': sum(r['h3_bytes'] for r in available),
+        'total_bytes': sum(r['total_bytes'] for r in available),
+        'remaining_bytes': sum(r['remaining_bytes'] for r in available),
+    }
+    result['required_bytes'] = int(result['remaining_bytes'] * space_factor)
+    result['free_bytes'] = free_disk_space(work_dir)
+    result['fits'] = result['required_bytes'] <= result['free_bytes']
+    return result
+
+
+def print_preflight(result):
+    """Print a preflight() report as a table"""
+    mb = 1024 * 1024
+    print(f"\n{'='*60}")
+    print(f"PRE-FLIGHT REPORT")
+    print(f"{'='*60}")
+    for r in result['titles']:
+        if r['available']:
+            print(f"✓ {r['title_id']}: {r['contents']} contents, {r['total_bytes'] / mb:.1f} MB "
+                  f"(.h3 {r['h3_bytes']} bytes), {r['remaining_bytes'] / mb:.1f} MB to download")
+        elif r['error']:
+            print(f"✗ {r['title_id']}: {r['error']}")
+        else:
+            print(f"- {r['title_id']}: not on the CDN")
+    print(f"{'='*60}")
+    print(f"Titles: {result['titles_available']}/{len(result['titles'])} available, {result['contents']} contents")
+    print(f"Total size: {result['total_bytes'] / mb:.1f} MB, {result['remaining_bytes'] / mb:.1f} MB to download")
+    print(f"Disk space: {result['required_bytes'] / mb:.1f} MB needed, {result['free_bytes'] / mb:.1f} MB free")
+    print(f"{'✅ Enough space' if result['fits'] else '❌ Not enough space'}")
+    print(f"{'='*60}")
+
+
+# Hash-tree blocks re-fetched with one Range request at most
+REPAIR_MAX_RANGE_BLOCKS = 64
+
+
+def block_ranges(blocks, max_blocks=REPAIR_MAX_RANGE_BLOCKS):
+    """Merge sorted block numbers into (first, last) runs of at most max_blocks"""
+    ranges = []
+    for block in blocks:
+        if ranges and block == ranges[-1][1] + 1 and block - ranges[-1][0] < max_blocks:
+            ranges[-1][1] = block
+        else:
+            ranges.append([block, block])
+    return [tuple(r) for r in ranges]
+
+
+def verify_content(content, app_path, titlekey, h3_path=None):
+    """
+    Check a downloaded .app against its TMD record, True if it verifies
+
+    Hash-tree contents need their .h3, which has to match the TMD hash, and
+    every block is checked against it; other contents by their SHA-1.
+    """
+    import wiiu_decryptor
+
+    content_type, content_size, content_index, content_hash = content[1:]
+    if content_type & 0x2:
+        try:
+            with open(h3_path, 'rb') as f:
+                h3_hashes = f.read()
+        except (OSError, TypeError):
+            return False
+        if hashlib.sha1(h3_hashes).digest() != content_hash:
+            return False
+        return not wiiu_decryptor.verify_hash_tree_blocks(titlekey, app_path, h3_hashes, content_size)
+    return wiiu_decryptor.verify_flat_content(titlekey, app_path, content_index, content_hash)
+
+
+def repair_content(base, content, game_dir, titlekey, bridge=None, token=None, workers=DEFAULT_DOWNLOAD_THREADS,
+                   limiter=None, store=None):
+    """
+    Verify one downloaded .app and fix what is broken
+
+    Hash-tree contents are checked block by block against the .h3 and the
+    hashes in every block (in parallel), and only the bad 0x10000-byte
+    blocks are fetched again with Range requests and written in place.
+    Other contents can only be checked as a whole and are downloaded again
+    when their SHA-1 does not match the TMD. A stale <cid>.app.dec of a
+    repaired content is removed so it gets decrypted again. A content that
+    needs repair is first dropped from the `store` (a TitleContentStore):
+    it may be a hardlink of the stored entry, which would otherwise keep
+    serving the broken bytes or be patched halfway.
+
+    Returns (status, bad_blocks) with status 'ok', 'repaired', 'redownloaded',
+    'missing', 'failed' or 'cancelled'
+    """
+    import wiiu_decryptor
+
+    content_id, content_type, content_size, content_index, content_hash = content
+    app_path = os.path.join(game_dir, content_id + '.app')
+    if not os.path.exists(app_path) or os.path.exists(app_path + '.part'):
+        print(f"  ⚠ {content_id}.app is not fully downloaded, skipping")
+        return 'missing', 0
+
+    def drop_stored():
+        if store is not None and store.remove(content):
+            print(f"  Removed {content_id} from the content store")
+
+    def drop_decrypted():
+        dec_path = os.path.join(game_dir, content_id + '.app.dec')
+        if os.path.exists(dec_path):
+            os.remove(dec_path)
+            print(f"  Removed stale {content_id}.app.dec")
+
+    if not content_type & 0x2:
+        if os.path.getsize(app_path) == content_size and wiiu_decryptor.verify_flat_content(
+                titlekey, app_path, content_index, content_hash):
+            return 'ok', 0
+        print(f"  ✗ {content_id} does not match its TMD hash, downloading it again")
+        drop_stored()
+        os.remove(app_path)
+        download_resumable(content_url(base, content_id), app_path, content_size, bridge=bridge, token=token,
+                           max_retries=3, retry_delay=1, limiter=limiter)
+        if is_cancelled(token):
+            return 'cancelled', 0
+        drop_decrypted()
+        if wiiu_decryptor.verify_flat_content(titlekey, app_path, content_index, content_hash):
+            return 'redownloaded', 0
+        return 'failed', 0
+
+    # The .h3 anchors the tree, it has to match the TMD before any block can be trusted
+    h3_path = os.path.join(game_dir, content_id + '.h3')
+    h3_hashes = b''
+    if os.path.exists(h3_path):
+        with open(h3_path, 'rb') as f:
+            h3_hashes = f.read()
+    if hashlib.sha1(h3_hashes).digest() != content_hash:
+        print(f"  ↻ {content_id}.h3 missing or corrupt, fetching it again")
+        drop_stored()
+        h3_hashes = download_with_retry(content_url(base, content_id + '.h3'), token=token, max_retries=3) or b''
+        if hashlib.sha1(h3_hashes).digest() != content_hash:
+            print(f"  ✗ {content_id}.h3 does not match the TMD")
+            return 'failed', 0
+        with open(h3_path, 'wb') as f:
+            f.write(h3_hashes)
+
+    def report(done, count):
+        if bridge:
+            bridge.update(int(done * 100 / count) if count else 100, f"Verifying {content_id}: block {done}/{count}",
+                          0, 0, 0, 0)
+
+    bad = wiiu_decryptor.verify_hash_tree_blocks(titlekey, app_path, h3_hashes, content_size, workers=workers,
+                                                 progress=report)
+    if not bad:
+        return 'ok', 0
+    if is_cancelled(token):
+        return 'cancelled', len(bad)
+
+    ranges = block_ranges(bad)
+    print(f"  ↻ {len(bad)} bad block(s) in {content_id}, fetching {len(ranges)} range(s)")
+    drop_stored()
+
+    def patch(block_range):
+        first, last = block_range
+        with open(app_path, 'r+b') as f:
+            f.seek(first * 0x10000)
+            download_with_retry(content_url(base, content_id), outfile=f, token=token, limiter=limiter,
+                                byte_range=(first * 0x10000, (last + 1) * 0x10000 - 1), max_retries=3,
+                                retry_delay=1)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ranges)))) as executor:
+        for future in [executor.submit(patch, r) for r in ranges]:
+            future.result()
+    if is_cancelled(token):
+        return 'cancelled', len(bad)
+
+    drop_decrypted()
+    still_bad = wiiu_decryptor.verify_hash_tree_blocks(titlekey, app_path, h3_hashes, content_size, blocks=bad,
+                                                       workers=workers)
+    if still_bad:
+        print(f"  ✗ {len(still_bad)} block(s) of {content_id} still fail verification")
+        return 'failed', len(bad)
+    return 'repaired', len(bad)
+
+
+def repair_title(title_id, work_dir, bridge=None, token=None, workers=DEFAULT_DOWNLOAD_THREADS,
+                 store_dir=None) -> dict:
+    """
+    Verify a downloaded title and repair its broken contents in place
+
+    Needs the title.tmd and title.tik written by main_with_progress in
+    work_dir/<title ID>. With the `store_dir` the title was downloaded with,
+    broken contents are dropped from the content store and put back once
+    repaired.
+
+    Returns:
+        Dict of content ID -> (status, bad_blocks), see repair_content()
+    """
+    token = cancel_mirror(token)
+    tid = title_id.upper()
+    game_dir = os.path.join(work_dir, tid)
+    tmd_path = os.path.join(game_dir, 'title.tmd')
+    if not os.path.exists(tmd_path):
+        print(f"❌ No title.tmd in {game_dir}")
+        return {}
+    with open(tmd_path, 'rb') as f:
+        tmd_data = f.read()
+    titlekey = load_titlekey(game_dir, tmd_data)
+    if titlekey is None:
+        print(f"❌ Title key unavailable, title.tik is needed to verify contents")
+        return {}
+
+    base = wiiu_hosts.title_hosts(tid, app_categories)
+    contents = parse_tmd_contents(tmd_data)
+    store = wiiu_store.get_store(store_dir).for_title(tid, titlekey) if store_dir else None
+    results = {}
+    for index, content in enumerate(contents):
+        if is_cancelled(token):
+            break
+        content_id = content[0]
+        print(f"[{index+1}/{len(contents)}] Verifying {content_id}.app")
+        try:
+            results[content_id] = repair_content(base, content, game_dir, titlekey, bridge, token, workers,
+                                                 store=store)
+            if store is not None and results[content_id][0] in ('repaired', 'redownloaded'):
+                app_path = os.path.join(game_dir, content_id + '.app')
+                store.add(content, app_path, app_path[:-4] + '.h3' if content[1] & 0x2 else None)
+        except Exception as e:
+            print(f"  ✗ Could not repair {content_id}: {e}")
+            results[content_id] = ('failed', 0)
+
+    print(f"\n{'='*60}")
+    print(f"REPAIR SUMMARY")
+    print(f"{'='*60}")
+    for status in ('ok', 'repaired', 'redownloaded', 'missing', 'failed', 'cancelled'):
+        ids = [cid for cid, r in results.items() if r[0] == status]
+        if ids:
+            print(f"{status.capitalize()}: {len(ids)}")
+    bad_blocks = sum(r[1] for r in results.values() if r[0] == 'repaired')
+    if bad_blocks:
+        print(f"Blocks fetched again: {bad_blocks} ({bad_blocks * 0x10000 / (1024 * 1024):.1f} MB)")
+    print(f"{'='*60}")
+    if bridge:
+        failed = sum(1 for r in results.values() if r[0] in ('failed', 'missing'))
+        bridge.update(100, f"Repair complete, {failed} content(s) still broken" if failed else "Repair complete",
+                      len(results), len(contents), 0, 0)
+    return results
+
+
 # Keep the old signature for backward compatibility
 def main_with_progress_old(title_id: str, work_dir: str, bridge=None, token=None) -> str:
     """Backward compatible version without provider_root_doc_uri"""
@@ -1069,14 +2532,72 @@ if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description='Download Wii U games')
-    parser.add_argument('title_id', help='Title ID of the game to download')
+    parser.add_argument('title_id', help='Title ID of the game to download (comma separated with --batch)')
     parser.add_argument('work_dir', help='Working directory for downloads')
     parser.add_argument('--no-decrypt', action='store_true', help='Skip automatic decryption')
     parser.add_argument('--delete', '-d', action='store_true', help='Delete encrypted files after decryption')
     parser.add_argument('--extract', '-e', action='store_true', help='Extract after decryption', default=True)
+    parser.add_argument('--threads', '-t', type=int, default=DEFAULT_DOWNLOAD_THREADS, help='Number of parallel content downloads')
+    parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS, help='Parallel byte ranges per large content (1 to disable)')
+    parser.add_argument('--read-kb', type=int, default=DEFAULT_READ_SIZE // 1024, help='Socket read size in KB')
+    parser.add_argument('--stream-decrypt', action='store_true', help='Decrypt contents while downloading')
+    parser.add_argument('--stream-extract', action='store_true', help='Decrypt and extract contents while downloading')
+    parser.add_argument('--limit-kb', type=int, default=0, help='Bandwidth limit per title in KB/s (0 for unlimited)')
+    parser.add_argument('--total-limit-kb', type=int, default=0, help='Bandwidth limit of all downloads in KB/s (0 for unlimited)')
+    parser.add_argument('--stall-timeout', type=int, default=DEFAULT_STALL_TIMEOUT, help='Seconds without data before reconnecting')
+    parser.add_argument('--min-kbps', type=int, default=DEFAULT_MIN_THROUGHPUT // 1024, help='Reconnect when a connection stays below this many KB/s (0 to disable)')
+    parser.add_argument('--hedge', action='store_true', help='Request the slowest segment twice near the end of a content')
+    parser.add_argument('--batch', action='store_true', help='Download several titles plus the update and DLC of each game')
+    parser.add_argument('--repair', action='store_true', help='Verify an existing download and re-fetch only its corrupt blocks')
+    parser.add_argument('--preflight', action='store_true', help='Only report the download size of the titles (comma separated) and check disk space')
+    parser.add_argument('--space-factor', type=float, default=1.0, help='Disk bytes needed per downloaded byte for --preflight')
+    parser.add_argument('--store', help='Content store directory shared between downloads')
+    parser.add_argument('--no-preallocate', action='store_true', help='Do not reserve content files at full size before downloading')
+    parser.add_argument('--metadata-ttl', type=int, default=wiiu_metacache.DEFAULT_TTL, help='Seconds a cached tmd/cetk is used before asking the CDN again')
+    parser.add_argument('--store-gb', type=int, default=wiiu_store.DEFAULT_MAX_BYTES // (1024 ** 3), help='Content store size cap in GB')
+    parser.add_argument('--engine', choices=['threads', 'asyncio'], default='threads', help='Download engine')
+    parser.add_argument('--min-segment-mb', type=int, default=DEFAULT_MIN_SEGMENT_SIZE // (1024 * 1024), help='Minimum byte range size in MB')
     
     args = parser.parse_args()
-    
+    wiiu_ratelimit.set_global_rate(args.total_limit_kb * 1024)
+
+    if args.repair:
+        results = repair_title(args.title_id, args.work_dir, workers=args.threads, store_dir=args.store)
+        sys.exit(0 if results and all(r[0] in ('ok', 'repaired', 'redownloaded') for r in results.values()) else 1)
+
+    if args.preflight:
+        report = preflight(args.title_id, args.work_dir, include_update=args.batch, include_dlc=args.batch,
+                           space_factor=args.space_factor, metadata_ttl=args.metadata_ttl)
+        print_preflight(report)
+        sys.exit(0 if report['fits'] else 1)
+
+    if args.batch:
+        start_time = time.time()
+        results = main_batch_with_progress(
+            args.title_id,
+            args.work_dir,
+            auto_decrypt=not args.no_decrypt,
+            delete_encrypted=args.delete,
+            auto_extract=args.extract,
+            download_threads=args.threads,
+            segments=args.segments,
+            min_segment_size=args.min_segment_mb * 1024 * 1024,
+            stream_decrypt=args.stream_decrypt,
+            stream_extract=args.stream_extract,
+            engine=args.engine,
+            rate_limit=args.limit_kb * 1024,
+            hedge=args.hedge,
+            store_dir=args.store,
+            store_max_bytes=args.store_gb * 1024 ** 3,
+            metadata_ttl=args.metadata_ttl,
+            preallocate_files=not args.no_preallocate,
+            read_size=args.read_kb * 1024,
+            stall_timeout=args.stall_timeout,
+            min_throughput=args.min_kbps * 1024
+        )
+        print(f"\n✅ Batch finished in {time.time() - start_time:.1f} seconds")
+        sys.exit(0 if any(results.values()) else 1)
+
     if len(args.title_id) != 16:
         print("Error: Title ID must be 16 characters")
         sys.exit(1)
@@ -1099,7 +2620,22 @@ if __name__ == "__main__":
         args.work_dir, 
         auto_decrypt=not args.no_decrypt,
         delete_encrypted=args.delete,
-        auto_extract=args.extract
+        auto_extract=args.extract,
+        download_threads=args.threads,
+        segments=args.segments,
+        min_segment_size=args.min_segment_mb * 1024 * 1024,
+        stream_decrypt=args.stream_decrypt,
+        stream_extract=args.stream_extract,
+        engine=args.engine,
+        rate_limit=args.limit_kb * 1024,
+        hedge=args.hedge,
+        store_dir=args.store,
+        store_max_bytes=args.store_gb * 1024 ** 3,
+        metadata_ttl=args.metadata_ttl,
+        preallocate_files=not args.no_preallocate,
+        read_size=args.read_kb * 1024,
+        stall_timeout=args.stall_timeout,
+        min_throughput=args.min_kbps * 1024
     )
     end_time = time.time()
     
@@ -0,0 +1,690 @@
+#!/usr/bin/env python3
+# wiiu_async.py
+
+# asyncio download engine. Mirrors runner.download / download_with_retry
+# (progress callbacks, cancellation token, retries that resume with Range
+# requests) but multiplexes every content and .h3 fetch on one event loop
+# with per-host connection limits. A batch runs all of its titles on one
+# AsyncEngine, so they share that loop and its connection pool.
+
+import asyncio
+import hashlib
+import http.client
+import io
+import os
+import threading
+import time
+from email.parser import Parser
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import getproxies, proxy_bypass
+
+import wiiu_retry
+from wiiu_hosts import content_url
+from wiiu_http import DNSCache, HostStats, MAX_REDIRECTS
+from wiiu_transfer import (ContentProgress, RangeNotSupportedError, StallError, StallMonitor, TransferSettings,
+                           download_stats, is_cancelled, load_segment_state, save_segment_state)
+
+# Connections open at the same time to one host
+DEFAULT_PER_HOST_LIMIT = 8
+
+# Content downloads in flight at the same time on the loop
+DEFAULT_MAX_CONCURRENCY = 64
+
+# Idle keep-alive connections kept per host
+DEFAULT_MAX_IDLE_PER_HOST = 8
+
+STALE_CONNECTION_ERRORS = (
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+    asyncio.IncompleteReadError,
+)
+
+
+class AsyncResponse:
+    """
+    Response read from a pooled asyncio connection
+
+    The connection goes back to the pool once the body has been read
+    completely; closing early discards it.
+    """
+
+    def __init__(self, pool, key, reader, writer, status, reason, headers, url):
+        self.pool = pool
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.url = url
+        self.will_close = headers.get('Connection', '').lower() == 'close'
+        length = headers.get('Content-Length')
+        self.remaining = int(length) if length is not None else None
+        if self.remaining is None:
+            self.will_close = True
+        elif self.remaining == 0:
+            self._finish(reusable=not self.will_close)
+
+    def _finish(self, reusable):
+        if self.writer is not None:
+            self.pool._release(self.key, self.reader, self.writer, reusable)
+            self.reader = self.writer = None
+
+    async def read(self, n=-1):
+        """Read up to n bytes of the body, b'' at the end"""
+        if self.writer is None:
+            return b''
+        if self.remaining is None:
+            data = await self.reader.read(n)
+            if not data:
+                self.close()
+            return data
+        if n < 0 or n > self.remaining:
+            n = self.remaining
+        data = await self.reader.read(n)
+        if not data:
+            self.close()
+            return b''
+        self.remaining -= len(data)
+        if self.remaining == 0:
+            self._finish(reusable=not self.will_close)
+        return data
+
+    async def read_all(self):
+        chunks = []
+        while True:
+            data = await self.read(64 * 1024)
+            if not data:
+                return b''.join(chunks)
+            chunks.append(data)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.pool._release(self.key, None, None, False)
+            self.reader = self.writer = None
+
+
+class AsyncConnectionPool:
+    """
+    Keep-alive HTTP/1.1 connections for one event loop
+
+    At most `per_host_limit` requests are in flight to a host at once, the
+    rest wait for a free connection. Proxies from the environment are
+    honoured like urlopen does.
+    """
+
+    def __init__(self, per_host_limit=DEFAULT_PER_HOST_LIMIT, max_idle_per_host=DEFAULT_MAX_IDLE_PER_HOST,
+                 timeout=None, dns_cache=None):
+        self.per_host_limit = per_host_limit
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.dns_cache = dns_cache or DNSCache()
+        self.idle = {}
+        self.semaphores = {}
+        self.host_stats = {}
+        self.proxies = getproxies()
+
+    def _stats(self, host):
+        stats = self.host_stats.get(host)
+        if stats is None:
+            stats = self.host_stats[host] = HostStats()
+        return stats
+
+    def _semaphore(self, key):
+        sem = self.semaphores.get(key)
+        if sem is None:
+            sem = self.semaphores[key] = asyncio.Semaphore(self.per_host_limit)
+        return sem
+
+    def _route(self, scheme, host, port):
+        proxy = self.proxies.get(scheme)
+        if proxy and scheme == 'http' and not proxy_bypass(host):
+            parts = urlsplit(proxy if '://' in proxy else 'http://' + proxy)
+            return parts.hostname, parts.port or 80, True
+        return host, port, False
+
+    async def _connect(self, host, port, ssl):
+        loop = asyncio.get_running_loop()
+        addresses = await loop.run_in_executor(None, self.dns_cache.resolve, host, port)
+        last_error = None
+        for address in addresses:
+            try:
+                connect = asyncio.open_connection(address[0], address[1], ssl=ssl,
+                                                  server_hostname=host if ssl else None)
+                if self.timeout:
+                    return await asyncio.wait_for(connect, self.timeout)
+                return await connect
+            except OSError as e:
+                last_error = e
+        self.dns_cache.invalidate(host, port)
+        raise last_error or OSError(f"Could not resolve {host}")
+
+    async def _acquire(self, key):
+        """Return (reader, writer, reused)"""
+        scheme, host, port, conn_host, conn_port, via_proxy = key
+        idle = self.idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                self._stats(host).reuses += 1
+                return reader, writer, True
+            writer.close()
+
+        start = time.monotonic()
+        reader, writer = await self._connect(conn_host, conn_port, scheme == 'https')
+        stats = self._stats(host)
+        stats.connects += 1
+        stats.connect_time += time.monotonic() - start
+        return reader, writer, False
+
+    def _release(self, key, reader, writer, reusable):
+        if writer is not None:
+            idle = self.idle.setdefault(key, [])
+            if reusable and len(idle) < self.max_idle_per_host:
+                idle.append((reader, writer))
+            else:
+                writer.close()
+        self._semaphore(key).release()
+
+    async def request(self, url, headers=None):
+        """
+        Send a GET request and return an AsyncResponse
+
+        Raises urllib.error.HTTPError for 4xx/5xx answers like urlopen.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await self._request_once(url, headers or {})
+            if response.status in (301, 302, 303, 307, 308) and response.headers.get('Location'):
+                location = response.headers['Location']
+                await response.read_all()
+                url = location if '://' in location else urlsplit(url)._replace(path=location, query='').geturl()
+                continue
+            if response.status >= 400:
+                response.close()
+                raise HTTPError(url, response.status, response.reason, response.headers, None)
+            return response
+        raise HTTPError(url, 310, 'Too many redirects', None, None)
+
+    async def _request_once(self, url, headers):
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        host = parts.hostname
+        port = parts.port or (443 if scheme == 'https' else 80)
+        conn_host, conn_port, via_proxy = self._route(scheme, host, port)
+        key = (scheme, host, port, conn_host, conn_port, via_proxy)
+
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        if via_proxy:
+            path = url
+
+        lines = [f'GET {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: keep-alive']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        request = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+        sem = self._semaphore(key)
+        await sem.acquire()
+        try:
+            while True:
+                reader, writer, reused = await self._acquire(key)
+                try:
+                    writer.write(request)
+                    await writer.drain()
+                    status_line = await reader.readline()
+                    if not status_line:
+                        raise ConnectionResetError('Connection closed before the response')
+                    header_lines = []
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        header_lines.append(line.decode('latin-1'))
+                except STALE_CONNECTION_ERRORS:
+                    writer.close()
+                    if not reused:
+                        raise
+                    # The server dropped an idle keep-alive connection, try a fresh one
+                    self._stats(host).stale += 1
+                    continue
+                except BaseException:
+                    writer.close()
+                    raise
+                break
+        except BaseException:
+            sem.release()
+            raise
+
+        version, status, reason = (status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+        response_headers = Parser(_class=http.client.HTTPMessage).parsestr(''.join(header_lines))
+        self._stats(host).requests += 1
+        return AsyncResponse(self, key, reader, writer, int(status), reason, response_headers, url)
+
+    def stats(self):
+        """Return per-host and total connection statistics"""
+        total = HostStats()
+        for s in self.host_stats.values():
+            total.requests += s.requests
+            total.connects += s.connects
+            total.reuses += s.reuses
+            total.stale += s.stale
+            total.connect_time += s.connect_time
+        result = total.as_dict()
+        result['hosts'] = {host: s.as_dict() for host, s in self.host_stats.items()}
+        return result
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"Async connection pool: {s['requests']} requests, {s['connects']} connects, "
+              f"{s['reuse_rate'] * 100:.0f}% reused, avg connect {s['avg_connect_ms']:.0f} ms")
+
+    def close(self):
+        for conns in self.idle.values():
+            for reader, writer in conns:
+                writer.close()
+        self.idle = {}
+
+
+async def within(awaitable, timeout):
+    """Await with a stall timeout, raising StallError so the retry reconnects"""
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise StallError(f"No data for {timeout}s")
+
+
+async def download_async(pool, url, outfile=None, bridge=None, chunk_callback=None, token=None,
+                         byte_range=None, progress_offset=0, read_size=None, limiter=None, stall_timeout=None,
+                         settings=None):
+    """
+    Download a single file on the event loop, same contract as runner.download
+
+    Returns the body as bytes when no outfile is given, None if cancelled.
+    """
+    settings = settings or TransferSettings()
+    read_size = read_size or settings.read_size
+    stall_timeout = stall_timeout or settings.stall_timeout
+    monitor = StallMonitor(settings.min_throughput)
+    cn = None
+    reads = 0
+    totalread = 0
+    try:
+        if byte_range:
+            start, end = byte_range
+            cn = await within(pool.request(url, {'Range': f'bytes={start}-{"" if end is None else end}'}),
+                              stall_timeout)
+            if cn.status != 206:
+                cn.close()
+                raise RangeNotSupportedError(f"Server ignored Range request for {url}")
+            content_range = cn.headers.get('Content-Range', '')
+            if not content_range.startswith(f'bytes {start}-'):
+                cn.close()
+                raise IOError(f"Unexpected Content-Range '{content_range}' for bytes {start}-")
+        else:
+            cn = await within(pool.request(url), stall_timeout)
+        totalsize = int(cn.headers['content-length'])
+
+        if not outfile:
+            ct = bytearray(totalsize)
+
+        while totalsize > totalread:
+            # Check for cancellation
+            if is_cancelled(token):
+                if bridge:
+                    bridge.update(0, "Download cancelled", 0, 0, 0, 0)
+                cn.close()
+                return None
+
+            co = await within(cn.read(min(totalsize - totalread, read_size)), stall_timeout)
+            reads += 1
+            if not co:  # End of stream
+                break
+
+            if outfile:
+                with wiiu_retry.local_writes():
+                    outfile.write(co)
+            else:
+                ct[totalread:totalread + len(co)] = co
+            totalread += len(co)
+            if limiter:
+                delay = limiter.reserve(len(co))
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    monitor.pause(delay)
+            monitor.update(len(co))
+
+            if chunk_callback:
+                chunk_callback(progress_offset + totalread, progress_offset + totalsize)
+
+        if totalread < totalsize:
+            raise IOError(f"Connection closed after {totalread} of {totalsize} bytes")
+
+        return bytes(ct) if not outfile else None
+
+    except RangeNotSupportedError:
+        raise
+    except Exception as e:
+        if cn is not None:
+            cn.close()
+        print(f"\nDownload error for {url}: {e}")
+        if bridge:
+            bridge.update(0, f"Download error: {e}", 0, 0, 0, 0)
+        raise
+    finally:
+        # Every read returns a new bytes object from the StreamReader
+        download_stats.add(totalread, reads, reads)
+
+
+async def download_with_retry_async(pool, url, max_retries=3, retry_delay=2, **kwargs):
+    """Download through the wiiu_retry policy, resuming partial bodies like runner.download_with_retry"""
+    outfile = kwargs.get('outfile')
+    buffer = None
+    if not outfile:
+        buffer = outfile = kwargs['outfile'] = io.BytesIO()
+    start_pos = outfile.tell()
+    byte_range = kwargs.pop('byte_range', None)
+    progress_offset = kwargs.pop('progress_offset', 0)
+
+    async def fetch(current):
+        resumed = outfile.tell() - start_pos
+        if resumed:
+            start = (byte_range[0] if byte_range else 0) + resumed
+            end = byte_range[1] if byte_range else None
+            if end is not None and start > end:
+                return None
+            print(f"  ↻ Resuming at byte {start}")
+            try:
+                return await download_async(pool, current, byte_range=(start, end),
+                                            progress_offset=progress_offset + resumed, **kwargs)
+            except RangeNotSupportedError:
+                if byte_range:
+                    raise
+                print(f"  ⚠ Server ignored Range request, restarting from the beginning")
+                with wiiu_retry.local_writes():
+                    outfile.seek(start_pos)
+                    outfile.truncate()
+        return await download_async(pool, current, byte_range=byte_range, progress_offset=progress_offset, **kwargs)
+
+    async def attempt(n, current):
+        if not hasattr(url, 'record'):
+            return await fetch(current)
+        before = outfile.tell()
+        started = time.monotonic()
+        ok = False
+        try:
+            result = await fetch(current)
+            ok = True
+            return result
+        finally:
+            url.record(current, outfile.tell() - before, time.monotonic() - started, ok)
+
+    await wiiu_retry.get_policy().run_async(url, attempt, max_retries=max_retries, base_delay=retry_delay,
+                                            passthrough=(RangeNotSupportedError,))
+    if buffer is not None and not is_cancelled(kwargs.get('token')):
+        return buffer.getvalue()
+    return None
+
+
+async def download_resumable_async(pool, url, file_path, content_size, **kwargs):
+    """Download a file on the loop, resuming after any bytes already on disk"""
+    offset = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+    if offset >= content_size:
+        offset = 0
+
+    if offset:
+        print(f"  ↻ Resuming {os.path.basename(file_path)} at {offset / (1024 * 1024):.1f} MB")
+        try:
+            with open(file_path, 'r+b') as f:
+                f.seek(offset)
+                f.truncate()
+                return await download_with_retry_async(pool, url, outfile=f, byte_range=(offset, None),
+                                                       progress_offset=offset, **kwargs)
+        except RangeNotSupportedError:
+            print(f"  ⚠ Server ignored Range request, restarting from the beginning")
+
+    with open(file_path, 'wb') as f:
+        return await download_with_retry_async(pool, url, outfile=f, **kwargs)
+
+
+async def download_segments_async(pool, url, file_path, content_size, state, chunk_callback=None, token=None,
+                                  **kwargs):
+    """
+    Finish a segmented download of the thread engine on the loop
+
+    `state` is the [start, end, done] list from <file>.part. Every unfinished
+    range is fetched as a task from where it stopped, and the state file is
+    updated as they end so either engine can resume again. Raises
+    RangeNotSupportedError if the server ignores Range requests.
+
+    Returns True when the file is complete, None if cancelled
+    """
+    segment_read = [s[2] for s in state]
+    done = sum(segment_read)
+    if done:
+        print(f"  ↻ Resuming {len(state)} segment(s) at {done / (1024 * 1024):.1f} MB")
+
+    def report(n, chunk_read):
+        segment_read[n] = max(segment_read[n], chunk_read)
+        if chunk_callback:
+            chunk_callback(sum(segment_read), content_size)
+
+    async def fetch(n):
+        start, end, done = state[n]
+        if start + done > end:
+            return
+        with open(file_path, 'r+b') as f:
+            f.seek(start + done)
+            try:
+                await download_with_retry_async(pool, url, outfile=f, chunk_callback=lambda r, t: report(n, r),
+                                                token=token, byte_range=(start + done, end), progress_offset=done,
+                                                **kwargs)
+            finally:
+                f.flush()
+                state[n][2] = f.tell() - start
+                save_segment_state(file_path, content_size, state)
+
+    results = await asyncio.gather(*(fetch(n) for n in range(len(state))), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    if is_cancelled(token):
+        return None
+
+    missing = sum(end - start + 1 - done for start, end, done in state)
+    if missing:
+        raise IOError(f"Segmented download incomplete: {missing} bytes missing")
+    os.remove(file_path + '.part')
+    return True
+
+
+def h3_matches(h3_path, content_hash):
+    """True if the .h3 on disk (usually from runner.prefetch_metadata) matches the TMD hash"""
+    if not os.path.exists(h3_path):
+        return False
+    with open(h3_path, 'rb') as f:
+        return hashlib.sha1(f.read()).digest() == content_hash
+
+
+async def download_content_async(pool, base, index, content, game_dir, progress, bridge=None, token=None,
+                                 limiter=None, settings=None):
+    """
+    Download one .app content (and its .h3 hash file when required) on the loop
+
+    Returns True on success, False on failure and None if cancelled
+    """
+    content_id, content_type, content_size = content[:3]
+
+    if is_cancelled(token):
+        return None
+
+    file_size_mb = content_size / (1024 * 1024)
+    file_msg = f"File {index+1}/{progress.total_files}: {content_id}.app ({file_size_mb:.1f} MB)"
+    progress.start_file(content_id, file_msg)
+    print(f"[{index+1}/{progress.total_files}] {file_msg}")
+
+    file_path = os.path.join(game_dir, content_id + '.app')
+    part_path = file_path + '.part'
+    if os.path.exists(file_path) and os.path.getsize(file_path) == content_size and not os.path.exists(part_path):
+        print(f"  ✓ Already downloaded")
+        progress.complete_file(content_id, content_size)
+        return True
+    # Byte ranges left by a segmented thread engine download continue where they stopped
+    state = load_segment_state(file_path, content_size)
+    if state is None and os.path.exists(part_path):
+        os.remove(part_path)
+
+    try:
+        callback = progress.make_callback(content_id, content_size) if bridge else None
+        url = content_url(base, content_id)
+        kwargs = dict(bridge=bridge, token=token, max_retries=3, retry_delay=1, limiter=limiter, settings=settings)
+        if state is not None:
+            try:
+                await download_segments_async(pool, url, file_path, content_size, state, chunk_callback=callback,
+                                              **kwargs)
+            except RangeNotSupportedError:
+                print(f"  ⚠ Server ignored Range requests, downloading {content_id} again as one stream")
+                os.remove(part_path)
+                os.remove(file_path)
+                state = None
+        if state is None:
+            await download_resumable_async(pool, url, file_path, content_size, chunk_callback=callback, **kwargs)
+        if is_cancelled(token):
+            return None
+    except Exception as e:
+        print(f"  ✗ Failed {content_id}: {e}")
+        # Keep the partial file so the next run resumes from it
+        progress.fail_file(content_id)
+        return False
+
+    h3_path = os.path.join(game_dir, content_id + '.h3')
+    if content_type & 0x2 and not h3_matches(h3_path, content[4]):
+        try:
+            with open(h3_path, 'wb') as f:
+                await download_with_retry_async(pool, content_url(base, content_id + '.h3'), outfile=f,
+                                                bridge=bridge, token=token, max_retries=2, settings=settings)
+        except Exception as e:
+            print(f"  ⚠ Hash file failed: {e}")
+            # Non-critical, continue
+
+    progress.complete_file(content_id, content_size)
+    return True
+
+
+async def download_contents_async(base, contents, game_dir, bridge=None, token=None, pool=None,
+                                  max_concurrency=DEFAULT_MAX_CONCURRENCY, progress=None, limiter=None,
+                                  settings=None, limit=None):
+    """
+    Download all content files of one title as tasks on the running loop
+
+    Same result as runner.download_contents: (progress, failed_files, cancelled).
+    Several titles can be awaited together on one loop sharing `pool` and
+    `limit`, a semaphore bounding their content downloads in flight
+    (max_concurrency is used when None).
+    """
+    own_pool = pool is None
+    if own_pool:
+        pool = AsyncConnectionPool()
+    if progress is None:
+        progress = ContentProgress(bridge, len(contents), sum(c[2] for c in contents))
+
+    if limit is None:
+        limit = asyncio.Semaphore(max(1, int(max_concurrency)))
+
+    async def worker(i):
+        async with limit:
+            return await download_content_async(pool, base, i, contents[i], game_dir, progress, bridge, token,
+                                                limiter, settings)
+
+    order = sorted(range(len(contents)), key=lambda i: contents[i][2], reverse=True)
+    tasks = [asyncio.ensure_future(worker(i)) for i in order]
+
+    async def watch_cancel():
+        # Stop waiting workers promptly instead of on their next chunk
+        while not all(t.done() for t in tasks):
+            if is_cancelled(token):
+                for t in tasks:
+                    t.cancel()
+                return
+            await asyncio.sleep(0.2)
+
+    watcher = asyncio.ensure_future(watch_cancel())
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    watcher.cancel()
+
+    failed_files = []
+    cancelled = False
+    for i, result in zip(order, results):
+        if result is False or isinstance(result, Exception):
+            failed_files.append(contents[i][0])
+        elif result is None or isinstance(result, asyncio.CancelledError):
+            cancelled = True
+
+    if cancelled or is_cancelled(token):
+        print("\nDownload cancelled by user")
+        progress.cancel()
+        cancelled = True
+
+    if own_pool:
+        pool.print_stats()
+        pool.close()
+    return progress, failed_files, cancelled
+
+
+def run_download_contents(base, contents, game_dir, bridge=None, token=None, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                          per_host_limit=DEFAULT_PER_HOST_LIMIT, limiter=None, settings=None):
+    """Blocking wrapper that runs download_contents_async on a new event loop"""
+
+    async def run():
+        pool = AsyncConnectionPool(per_host_limit=per_host_limit)
+        try:
+            return await download_contents_async(base, contents, game_dir, bridge, token, pool=pool,
+                                                 max_concurrency=max_concurrency, limiter=limiter,
+                                                 settings=settings)
+        finally:
+            pool.print_stats()
+            pool.close()
+
+    return asyncio.run(run())
+
+
+class AsyncEngine:
+    """
+    Event loop on a background thread with one connection pool
+
+    Titles downloaded from several threads (main_batch_with_progress) all
+    submit their contents here, so per_host_limit and max_concurrency bound
+    the whole batch instead of every title separately.
+    """
+
+    def __init__(self, per_host_limit=DEFAULT_PER_HOST_LIMIT, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self.pool = AsyncConnectionPool(per_host_limit=per_host_limit)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name='wiiu-async', daemon=True)
+        self.thread.start()
+        self.limit = self._call(self._make_limit(max(1, int(max_concurrency))))
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _make_limit(self, max_concurrency):
+        # Created on the loop so it binds to it on Python < 3.10
+        return asyncio.Semaphore(max_concurrency)
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def download_contents(self, base, contents, game_dir, bridge=None, token=None, limiter=None, settings=None):
+        """Blocking download_contents_async of one title on the shared loop, callable from any thread"""
+        return self._call(download_contents_async(base, contents, game_dir, bridge, token, pool=self.pool,
+                                                  limiter=limiter, settings=settings, limit=self.limit))
+
+    def close(self):
+        self.pool.print_stats()
+        self.loop.call_soon_threadsafe(self.pool.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
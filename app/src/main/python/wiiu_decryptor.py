@@ -2,16 +2,29 @@
 # wiiu_decryptor.py
 
 import binascii
+import collections
+import concurrent.futures
 import hashlib
 import math
 import os
 import struct
 import sys
+import threading
+import time
 import argparse
 
 # Hardcoded Wii U Common Key
 WIIU_COMMON_KEY = 'D7B00402659BA2ABD2CB0DB27FA2B656'
 
+# Contents decrypted at the same time by decrypt_game
+DEFAULT_DECRYPT_WORKERS = os.cpu_count() or 1
+
+# Hash-tree blocks (0x10000 bytes each) handed to a worker at a time
+DEFAULT_BLOCK_BATCH = 64
+
+# Bytes of a content without hash tree handed to a worker at a time (multiple of 16)
+DEFAULT_FLAT_SEGMENT = 4 * 1024 * 1024
+
 # Try to import AES implementations
 AES_AVAILABLE = False
 AES_LIBRARY = None
@@ -44,6 +57,16 @@ except ImportError:
             print("   pip install pyaes")
             AES_AVAILABLE = False
 
+# Optional: NumPy lets hash-tree spans decrypt as one ECB pass plus array XORs
+try:
+    import numpy
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# pyaes has no fast ECB, so it keeps the per-block path
+BULK_AVAILABLE = NUMPY_AVAILABLE and AES_LIBRARY in ('pycryptodome', 'cryptography')
+
 
 def validate_common_key():
     """Validate the hardcoded common key"""
@@ -92,6 +115,81 @@ def aes_cbc_decrypt(key, iv, data):
         raise RuntimeError(f"Unknown AES library: {AES_LIBRARY}")
 
 
+class CBCDecryptor:
+    """AES-CBC decryptor that carries the chaining value across decrypt() calls"""
+
+    def __init__(self, key, iv):
+        if not AES_AVAILABLE:
+            raise RuntimeError("No AES library available")
+
+        if AES_LIBRARY == 'pycryptodome':
+            cipher = AES.new(key, AES.MODE_CBC, iv)
+            self._decrypt = cipher.decrypt
+            self._decrypt_into = lambda data, out: cipher.decrypt(data, output=out[:len(data)])
+        elif AES_LIBRARY == 'cryptography':
+            context = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend()).decryptor()
+            self._decrypt = context.update
+            self._decrypt_into = context.update_into
+        elif AES_LIBRARY == 'pyaes':
+            aes = pyaes.AESModeOfOperationCBC(key, iv=iv)
+            self._decrypt = lambda data: b''.join(aes.decrypt(bytes(data[i:i+16])) for i in range(0, len(data), 16))
+            self._decrypt_into = None
+        else:
+            raise RuntimeError(f"Unknown AES library: {AES_LIBRARY}")
+
+    def decrypt(self, data):
+        """Decrypt data, which must be a multiple of 16 bytes"""
+        return self._decrypt(data)
+
+    def decrypt_into(self, data, out):
+        """
+        Decrypt data into the writable buffer out, without allocating
+
+        out must hold len(data) + 15 bytes (cryptography's update_into
+        needs the slack). Returns the number of bytes written.
+        """
+        if self._decrypt_into is None:
+            out[:len(data)] = self._decrypt(data)
+        else:
+            self._decrypt_into(data, out)
+        return len(data)
+
+
+def decrypt_flat_stream(titlekey, iv, encrypted, decrypted=None, readsize=8 * 1024 * 1024, progress=None):
+    """
+    Decrypt a content without hash tree from one file object into another
+
+    One CBC context runs over the whole content, so the chain carries across
+    reads. Every read goes with readinto() into the same buffer and decrypts
+    into a second preallocated buffer, so no chunk allocates or copies.
+    `decrypted` may be None to only hash. progress(bytes_done) is called
+    after every read.
+
+    Returns the sha1 object of the decrypted content
+    """
+    cipher = CBCDecryptor(titlekey, iv)
+    content_hash_calc = hashlib.sha1()
+    in_view = memoryview(bytearray(readsize))
+    out_view = memoryview(bytearray(readsize + 15))
+    done = 0
+    while True:
+        n = encrypted.readinto(in_view)
+        if not n:
+            break
+        # Trailing bytes off the 16-byte grid are dropped, like before
+        n &= ~0xF
+        if not n:
+            break
+        cipher.decrypt_into(in_view[:n], out_view)
+        content_hash_calc.update(out_view[:n])
+        if decrypted is not None:
+            decrypted.write(out_view[:n])
+        done += n
+        if progress:
+            progress(done)
+    return content_hash_calc
+
+
 def show_progress(val, maxval, cid):
     """Show progress percentage"""
     if maxval > 0:
@@ -152,8 +250,355 @@ def get_encrypted_titlekey(tik_path):
     return None
 
 
-def decrypt_game(game_dir, output_dir=None, delete_encrypted=False):
-    """Main decryption function"""
+def decrypt_titlekey(encrypted_titlekey, title_id):
+    """Decrypt the titlekey with the common key (IV is the title ID + 8 zero bytes)"""
+    ckey = binascii.unhexlify(WIIU_COMMON_KEY)
+    iv = title_id + bytes(8)
+    decrypted_titlekey = aes_cbc_decrypt(ckey, iv, encrypted_titlekey)
+
+    # Trim to 16 bytes if needed
+    return decrypted_titlekey[:16]
+
+
+def decrypt_hash_tree_block(titlekey, block, h3_hashes, chunk_num):
+    """
+    Decrypt and verify one 0x10000-byte block of a hash-tree content
+
+    Returns (hash_tree, decrypted_data, problems) where problems lists the
+    checks that failed for this block.
+    """
+    # Decrypt hash tree (0x400 bytes)
+    hash_tree = aes_cbc_decrypt(titlekey, bytes(16), block[:0x400])
+
+    # Decrypt content data (0xFC00 bytes) with the start of its H0 hash as IV
+    h0_hash_num = chunk_num % 16
+    iv = hash_tree[(h0_hash_num * 0x14):(h0_hash_num * 0x14) + 0x10]
+    decrypted_data = aes_cbc_decrypt(titlekey, iv, block[0x400:])
+
+    return hash_tree, decrypted_data, check_hash_tree_block(hash_tree, decrypted_data, h3_hashes, chunk_num)
+
+
+def check_hash_tree_block(hash_tree, decrypted_data, h3_hashes, chunk_num):
+    """Return the checks a decrypted hash-tree block fails, H0-H3 only when h3_hashes are given"""
+    problems = []
+
+    # Hash indices of this block at every level of the tree
+    h0_hash_num = chunk_num % 16
+    h1_hash_num = (chunk_num // 16) % 16
+    h2_hash_num = (chunk_num // 256) % 16
+    h3_hash_num = chunk_num // 4096
+
+    # Extract hashes
+    h0_hashes = hash_tree[0:0x140]
+    h0_hash = h0_hashes[(h0_hash_num * 0x14):((h0_hash_num + 1) * 0x14)]
+
+    # Verify hash tree if h3 hashes are available
+    if h3_hashes:
+        h1_hashes = hash_tree[0x140:0x280]
+        h2_hashes = hash_tree[0x280:0x3c0]
+        h1_hash = h1_hashes[(h1_hash_num * 0x14):((h1_hash_num + 1) * 0x14)]
+        h2_hash = h2_hashes[(h2_hash_num * 0x14):((h2_hash_num + 1) * 0x14)]
+        h3_hash = h3_hashes[(h3_hash_num * 0x14):((h3_hash_num + 1) * 0x14)]
+
+        if hashlib.sha1(h0_hashes).digest() != h1_hash:
+            problems.append('H0 Hashes invalid')
+        if hashlib.sha1(h1_hashes).digest() != h2_hash:
+            problems.append('H1 Hashes invalid')
+        if hashlib.sha1(h2_hashes).digest() != h3_hash:
+            problems.append('H2 Hashes invalid')
+
+    # Verify data hash
+    if hashlib.sha1(decrypted_data).digest() != h0_hash:
+        problems.append('Data block hash invalid')
+
+    return problems
+
+
+def aes_ecb_decrypt_into(key, data, out):
+    """Decrypt data (a multiple of 16 bytes) with AES-ECB into out, which needs len(data) + 15 bytes"""
+    if AES_LIBRARY == 'pycryptodome':
+        AES.new(key, AES.MODE_ECB).decrypt(data, output=out[:len(data)])
+    elif AES_LIBRARY == 'cryptography':
+        Cipher(algorithms.AES(key), modes.ECB(), backend=default_backend()).decryptor().update_into(data, out)
+    else:
+        raise RuntimeError(f"No bulk ECB with {AES_LIBRARY}")
+
+
+def decrypt_hash_tree_span(titlekey, span, h3_hashes, first_chunk):
+    """
+    Decrypt and verify consecutive 0x10000-byte blocks of a hash-tree content
+
+    CBC decryption is an ECB decryption XORed with the previous ciphertext
+    block (or the IV). With NumPy the whole span is one ECB call, the
+    chaining is two array XORs and the data IVs (the H0 hash of every block)
+    are gathered from the decrypted hash trees at once; only the SHA-1
+    checks stay per block. Without NumPy every block goes through
+    decrypt_hash_tree_block().
+
+    Returns (decrypted, problems), problems name their chunk
+    """
+    count = len(span) // 0x10000
+    problems = []
+    if not BULK_AVAILABLE:
+        decrypted = bytearray()
+        for i in range(count):
+            hash_tree, decrypted_data, block_problems = decrypt_hash_tree_block(
+                titlekey, span[i * 0x10000:(i + 1) * 0x10000], h3_hashes, first_chunk + i)
+            problems.extend(f'{problem} in chunk {first_chunk + i}' for problem in block_problems)
+            decrypted += hash_tree
+            decrypted += decrypted_data
+        return decrypted, problems
+
+    size = count * 0x10000
+    out = bytearray(size + 15)
+    aes_ecb_decrypt_into(titlekey, memoryview(span)[:size], out)
+
+    # 8-byte lanes, the 16-byte AES blocks are pairs of lanes
+    plain = numpy.frombuffer(out, dtype=numpy.uint64, count=size // 8).reshape(count, 0x2000)
+    cipher = numpy.frombuffer(span, dtype=numpy.uint64, count=size // 8).reshape(count, 0x2000)
+
+    # Hash trees chain from a zero IV, so their first AES block is already plain
+    plain[:, 2:0x80] ^= cipher[:, 0:0x7E]
+
+    # Data IV: first 16 bytes of the block's own H0 hash in the decrypted tree
+    h0_lanes = (numpy.arange(first_chunk, first_chunk + count) % 16) * 0x14 // 4
+    # View the contiguous array before slicing, NumPy < 1.23 cannot resize the dtype of a slice
+    tree32 = plain.view(numpy.uint32)[:, :0x100]
+    ivs = tree32[numpy.arange(count)[:, None], h0_lanes[:, None] + numpy.arange(4)]
+    plain[:, 0x80:0x82] ^= ivs.view(numpy.uint64)
+    plain[:, 0x82:] ^= cipher[:, 0x80:-2]
+
+    decrypted = memoryview(out)[:size]
+    for i in range(count):
+        block = decrypted[i * 0x10000:(i + 1) * 0x10000]
+        block_problems = check_hash_tree_block(block[:0x400], block[0x400:], h3_hashes, first_chunk + i)
+        problems.extend(f'{problem} in chunk {first_chunk + i}' for problem in block_problems)
+    return decrypted, problems
+
+
+def verify_hash_tree_blocks(titlekey, app_file, h3_hashes, content_size, blocks=None, workers=4, batch=64,
+                            progress=None):
+    """
+    Check blocks of an encrypted hash-tree content against their H0-H3 hashes
+
+    `blocks` lists the block numbers to check (default every block). Batches
+    of `batch` blocks are verified on `workers` threads, each with its own
+    file handle. Blocks missing from a short file count as bad.
+    progress(blocks_done, block_count) is called after every batch.
+
+    Returns the sorted list of bad block numbers
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import threading
+
+    if blocks is None:
+        blocks = range(content_size // 0x10000)
+    blocks = list(blocks)
+    bad = []
+    lock = threading.Lock()
+    done = [0]
+
+    def verify(chunk_nums):
+        failed = []
+        with open(app_file, 'rb') as f:
+            for chunk_num in chunk_nums:
+                f.seek(chunk_num * 0x10000)
+                block = f.read(0x10000)
+                if len(block) < 0x10000 or decrypt_hash_tree_block(titlekey, block, h3_hashes, chunk_num)[2]:
+                    failed.append(chunk_num)
+        with lock:
+            bad.extend(failed)
+            done[0] += len(chunk_nums)
+            if progress:
+                progress(done[0], len(blocks))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(verify, blocks[i:i + batch]) for i in range(0, len(blocks), batch)]
+        for future in futures:
+            future.result()
+    return sorted(bad)
+
+
+def decrypt_hash_tree_blocks(titlekey, app_file, output_file, h3_hashes, chunk_count, executor,
+                             batch=DEFAULT_BLOCK_BATCH):
+    """
+    Decrypt the blocks of a hash-tree content on an executor
+
+    Every block decrypts and verifies on its own, so batches of `batch`
+    blocks go to the workers and each writes at its block offset in the
+    presized output file. Returns the problems found, in block order.
+    """
+    with open(output_file, 'wb') as f:
+        f.truncate(chunk_count * 0x10000)
+
+    def decrypt_batch(first, last):
+        with open(app_file, 'rb') as encrypted:
+            encrypted.seek(first * 0x10000)
+            span = encrypted.read((last - first) * 0x10000)
+        plain, problems = decrypt_hash_tree_span(titlekey, span, h3_hashes, first)
+        with open(output_file, 'r+b') as decrypted:
+            decrypted.seek(first * 0x10000)
+            decrypted.write(plain)
+        return problems
+
+    futures = [executor.submit(decrypt_batch, first, min(first + batch, chunk_count))
+               for first in range(0, chunk_count, batch)]
+    problems = []
+    for future in futures:
+        problems.extend(future.result())
+    return problems
+
+
+def decrypt_flat_segments(titlekey, app_file, output_file, iv, executor, segment_size=DEFAULT_FLAT_SEGMENT,
+                          window=2 * DEFAULT_DECRYPT_WORKERS, slots=None):
+    """
+    Decrypt a content without hash tree as segments on an executor
+
+    A CBC plaintext block only depends on its own ciphertext block and the
+    one before it, so a segment starting on a 16-byte boundary decrypts on
+    its own with the preceding ciphertext block as IV (`iv` for the first).
+    Workers write at their segment offset and hand the plaintext back in
+    order for the SHA-1, with at most `window` segments in flight. Contents
+    decrypted at the same time share `slots`, a semaphore bounding their
+    segments in flight together.
+
+    Returns the sha1 object of the decrypted content
+    """
+    size = os.path.getsize(app_file) & ~0xF
+    with open(output_file, 'wb') as f:
+        f.truncate(size)
+
+    def decrypt_segment(start):
+        with open(app_file, 'rb') as encrypted:
+            if start:
+                encrypted.seek(start - 16)
+                segment_iv = encrypted.read(16)
+            else:
+                segment_iv = iv
+            data = encrypted.read(min(segment_size, size - start))
+        plain = CBCDecryptor(titlekey, segment_iv).decrypt(data)
+        with open(output_file, 'r+b') as decrypted:
+            decrypted.seek(start)
+            decrypted.write(plain)
+        return plain
+
+    content_hash_calc = hashlib.sha1()
+    starts = collections.deque(range(0, size, segment_size))
+    pending = collections.deque()
+    try:
+        while starts or pending:
+            # Only wait for a slot with nothing in flight, a content holding slots never waits on another
+            while starts and len(pending) < max(1, window):
+                if slots is not None and not slots.acquire(blocking=not pending):
+                    break
+                pending.append(executor.submit(decrypt_segment, starts.popleft()))
+            future = pending.popleft()
+            try:
+                content_hash_calc.update(future.result())
+            finally:
+                if slots is not None:
+                    slots.release()
+    finally:
+        if pending:
+            concurrent.futures.wait(pending)
+            if slots is not None:
+                for _ in pending:
+                    slots.release()
+    return content_hash_calc
+
+
+def verify_flat_content(titlekey, app_file, content_index, content_hash, readsize=8 * 1024 * 1024):
+    """Decrypt a content without hash tree in memory and compare its SHA-1 with the TMD, True if it matches"""
+    with open(app_file, 'rb') as f:
+        content_hash_calc = decrypt_flat_stream(titlekey, content_index + bytes(14), f, readsize=readsize)
+    return content_hash_calc.digest() == content_hash
+
+
+class ContentStreamDecryptor:
+    """
+    Decrypt one content while its encrypted bytes arrive from the network
+
+    Used as the outfile of runner.download: write() takes encrypted bytes and
+    writes the decrypted content to `output`, so the encrypted .app never
+    touches the disk. tell() reports the encrypted bytes consumed so a retry
+    can resume with a Range request, and seek(0) starts the content over.
+    """
+
+    def __init__(self, titlekey, content_id, content_index, content_type, content_hash, output, h3_hashes=b''):
+        self.titlekey = titlekey
+        self.content_id = content_id
+        self.content_index = content_index
+        self.hash_tree = bool(content_type & 2)
+        self.content_hash = content_hash
+        self.output = output
+        self.h3_hashes = h3_hashes
+        self.reset()
+
+    def reset(self):
+        self.consumed = 0
+        self.pending = bytearray()
+        self.chunk_num = 0
+        self.problems = []
+        self.content_hash_calc = hashlib.sha1()
+        if not self.hash_tree:
+            # IV: content_index + 14 zero bytes
+            self.cipher = CBCDecryptor(self.titlekey, self.content_index + bytes(14))
+        elif self.h3_hashes and hashlib.sha1(self.h3_hashes).digest() != self.content_hash:
+            self.problems.append('H3 Hash mismatch')
+        self.output.seek(0)
+        self.output.truncate()
+
+    def tell(self):
+        return self.consumed
+
+    def seek(self, pos):
+        if pos == 0:
+            self.reset()
+        elif pos != self.consumed:
+            raise IOError(f"Cannot seek a streaming decryptor to {pos}")
+
+    def truncate(self, size=None):
+        pass
+
+    def write(self, data):
+        self.consumed += len(data)
+        self.pending += data
+
+        if self.hash_tree:
+            ready = len(self.pending) & ~0xFFFF
+            if ready:
+                span = bytes(self.pending[:ready])
+                del self.pending[:ready]
+                plain, problems = decrypt_hash_tree_span(self.titlekey, span, self.h3_hashes, self.chunk_num)
+                self.problems.extend(problems)
+                self.output.write(plain)
+                self.chunk_num += ready // 0x10000
+        else:
+            ready = len(self.pending) & ~0xF
+            if ready:
+                decrypted = self.cipher.decrypt(bytes(self.pending[:ready]))
+                del self.pending[:ready]
+                self.content_hash_calc.update(decrypted)
+                self.output.write(decrypted)
+        return len(data)
+
+    def finish(self):
+        """Check the content hash once every byte was written, returns True if it verified"""
+        if self.pending:
+            self.problems.append(f'{len(self.pending)} trailing bytes not on a block boundary')
+        if not self.hash_tree and self.content_hash_calc.digest() != self.content_hash:
+            self.problems.append('Content Hash mismatch')
+        self.output.flush()
+        return not self.problems
+
+
+def decrypt_game(game_dir, output_dir=None, delete_encrypted=False, workers=DEFAULT_DECRYPT_WORKERS):
+    """
+    Main decryption function
+
+    Contents are independent once the title key is known, so `workers`
+    decrypt at the same time (1 keeps the old one-by-one output).
+    """
     
     if not AES_AVAILABLE:
         print("❌ No AES library available!")
@@ -200,174 +645,220 @@ def decrypt_game(game_dir, output_dir=None, delete_encrypted=False):
     
     # Decrypt titlekey
     try:
-        ckey = binascii.unhexlify(WIIU_COMMON_KEY)
-        iv = title_id + bytes(8)  # Title ID + 8 zero bytes
-        decrypted_titlekey = aes_cbc_decrypt(ckey, iv, encrypted_titlekey)
-        
-        # Trim to 16 bytes if needed
-        if len(decrypted_titlekey) > 16:
-            decrypted_titlekey = decrypted_titlekey[:16]
-            
+        decrypted_titlekey = decrypt_titlekey(encrypted_titlekey, title_id)
         print(f'Decrypted Titlekey: {decrypted_titlekey.hex().upper()}')
     except Exception as e:
         print(f'❌ Failed to decrypt titlekey: {e}')
         return False
     
-    # Decrypt each content
-    successful = 0
+    # Decrypt each content, largest first so the long ones do not finish last
     total = len(contents)
-    readsize = 8 * 1024 * 1024  # 8MB chunks
-    
-    for idx, (content_id, content_index, content_type, content_size, content_hash) in enumerate(contents):
-        print(f'[{idx+1}/{total}] Decrypting {content_id}...', end='')
-        
-        app_file = os.path.join(game_dir, content_id + '.app')
-        output_file = os.path.join(output_dir, content_id + '.app.dec')
-        
-        if not os.path.exists(app_file):
-            print(f'\n  ⚠ File {app_file} not found, skipping')
-            continue
-        
+    workers = max(1, min(int(workers or 1), total or 1))
+    order = sorted(range(total), key=lambda i: contents[i][3], reverse=True)
+    print(f'Decrypting with {workers} worker(s)')
+
+    started = time.monotonic()
+    results = {}
+    if workers == 1:
+        for idx in range(total):
+            print(f'[{idx+1}/{total}] Decrypting {contents[idx][0]}...', end='')
+            results[idx] = decrypt_content(decrypted_titlekey, game_dir, output_dir, contents[idx], delete_encrypted)
+            print_content_result(results[idx])
+    else:
+        pending = order
+        for use_processes in ((True, False) if AES_LIBRARY == 'pyaes' else (False,)):
+            pending = run_parallel(decrypted_titlekey, game_dir, output_dir, contents, pending, workers,
+                                   delete_encrypted, use_processes, results)
+            if not pending:
+                break
+    elapsed = time.monotonic() - started
+
+    print_decrypt_summary([results[i] for i in range(total) if i in results], total, elapsed)
+    return any(r['status'] == 'ok' for r in results.values())
+
+
+def run_parallel(titlekey, game_dir, output_dir, contents, order, workers, delete_encrypted, use_processes, results):
+    """
+    Decrypt the contents at the `order` indices on a worker pool, storing into results
+
+    Threads are used when the AES library releases the GIL (pycryptodome,
+    cryptography); the pure-Python pyaes gets processes instead. Returns the
+    indices still undone if the process pool could not run (Android has no
+    multiprocessing), so the caller can retry them on threads. On threads
+    the blocks of hash-tree contents are spread over a second pool as well.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from concurrent.futures.process import BrokenProcessPool
+
+    executor = None
+    block_pool = None
+    segment_slots = None
+    if use_processes:
         try:
-            if content_type & 2:  # Has hash tree
-                # Decrypt with hash tree
-                chunk_count = os.path.getsize(app_file) // 0x10000
-                
-                # Check for h3 file
-                h3_file = os.path.join(game_dir, content_id + '.h3')
-                h3_hashes = b''
-                if os.path.exists(h3_file):
-                    with open(h3_file, 'rb') as f:
-                        h3_hashes = f.read()
-                    if hashlib.sha1(h3_hashes).digest() != content_hash:
-                        print(f'\n  ⚠ H3 Hash mismatch for {content_id}')
-                else:
-                    print(f'\n  ⚠ Missing H3 file: {h3_file}')
-                
-                h0_hash_num = 0
-                h1_hash_num = 0
-                h2_hash_num = 0
-                h3_hash_num = 0
-                
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=workers)
+        except (ImportError, NotImplementedError, OSError) as e:
+            print(f'⚠ No process pool ({e}), decrypting on threads')
+            return order
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        # Shared by every large content so one of them still uses every core
+        block_pool = ThreadPoolExecutor(max_workers=workers)
+        # Decrypted segments of all contents waiting for their in-order SHA-1 (4MB each)
+        segment_slots = threading.BoundedSemaphore(2 * workers)
+
+    try:
+        with executor:
+            futures = {executor.submit(decrypt_content, titlekey, game_dir, output_dir, contents[i],
+                                       delete_encrypted, False, block_pool, segment_slots): i for i in order}
+            for future in as_completed(futures):
+                idx = futures[future]
+                results[idx] = future.result()
+                # Same shape as the sequential progress line, with the share of contents done
+                print(f'[{len(results)}/{len(contents)}] Decrypting {contents[idx][0]}... '
+                      f'{len(results) * 100 / len(contents):5.1f}%', end='')
+                print_content_result(results[idx])
+    except BrokenProcessPool as e:
+        print(f'⚠ Process pool failed ({e}), decrypting on threads')
+    finally:
+        if block_pool is not None:
+            block_pool.shutdown()
+    return [i for i in order if i not in results]
+
+
+def decrypt_content(titlekey, game_dir, output_dir, content, delete_encrypted=False, show=True, block_pool=None,
+                    segment_slots=None):
+    """
+    Decrypt one content of a title into <cid>.app.dec
+
+    Safe to run for several contents at the same time. `show` prints the
+    per-chunk progress line (off when contents decrypt in parallel). With a
+    `block_pool` executor the blocks of a hash-tree content are decrypted on
+    it, see decrypt_hash_tree_blocks(), and a large content without hash
+    tree is split into segments, see decrypt_flat_segments(). `segment_slots`
+    bounds those segments across the contents sharing the pool.
+
+    Returns a dict with content_id, size, status ('ok', 'missing' or 'error'),
+    warnings (hash problems, the content is still written) and error
+    """
+    content_id, content_index, content_type, content_size, content_hash = content
+    result = {'content_id': content_id, 'size': content_size, 'status': 'ok', 'warnings': [], 'error': None}
+    warnings = result['warnings']
+    readsize = 8 * 1024 * 1024  # 8MB chunks
+
+    app_file = os.path.join(game_dir, content_id + '.app')
+    output_file = os.path.join(output_dir, content_id + '.app.dec')
+
+    if not os.path.exists(app_file):
+        result['status'] = 'missing'
+        result['error'] = f'File {app_file} not found, skipping'
+        return result
+
+    try:
+        if content_type & 2:  # Has hash tree
+            # Decrypt with hash tree
+            chunk_count = os.path.getsize(app_file) // 0x10000
+
+            # Check for h3 file
+            h3_file = os.path.join(game_dir, content_id + '.h3')
+            h3_hashes = b''
+            if os.path.exists(h3_file):
+                with open(h3_file, 'rb') as f:
+                    h3_hashes = f.read()
+                if hashlib.sha1(h3_hashes).digest() != content_hash:
+                    warnings.append(f'H3 Hash mismatch for {content_id}')
+            else:
+                warnings.append(f'Missing H3 file: {h3_file}')
+
+            if block_pool is not None and chunk_count > DEFAULT_BLOCK_BATCH:
+                warnings.extend(decrypt_hash_tree_blocks(titlekey, app_file, output_file, h3_hashes,
+                                                         chunk_count, block_pool))
+            else:
                 with open(app_file, 'rb') as encrypted, open(output_file, 'wb') as decrypted:
-                    for chunk_num in range(chunk_count):
-                        show_chunk(chunk_num, chunk_count, content_id)
-                        
-                        # Decrypt hash tree (0x400 bytes)
-                        hash_tree_data = encrypted.read(0x400)
-                        hash_tree = aes_cbc_decrypt(decrypted_titlekey, bytes(16), hash_tree_data)
-                        
-                        # Extract hashes
-                        h0_hashes = hash_tree[0:0x140]
-                        h1_hashes = hash_tree[0x140:0x280] if h3_hashes else b''
-                        h2_hashes = hash_tree[0x280:0x3c0] if h3_hashes else b''
-                        
-                        # Get h0 hash for this chunk
-                        h0_hash = h0_hashes[(h0_hash_num * 0x14):((h0_hash_num + 1) * 0x14)]
-                        
-                        # Verify hash tree if h3 file exists
-                        if h3_hashes:
-                            h1_hash = h1_hashes[(h1_hash_num * 0x14):((h1_hash_num + 1) * 0x14)]
-                            h2_hash = h2_hashes[(h2_hash_num * 0x14):((h2_hash_num + 1) * 0x14)]
-                            h3_hash = h3_hashes[(h3_hash_num * 0x14):((h3_hash_num + 1) * 0x14)]
-                            
-                            if hashlib.sha1(h0_hashes).digest() != h1_hash:
-                                print(f'\n  ⚠ H0 Hashes invalid in chunk {chunk_num}')
-                            if hashlib.sha1(h1_hashes).digest() != h2_hash:
-                                print(f'\n  ⚠ H1 Hashes invalid in chunk {chunk_num}')
-                            if hashlib.sha1(h2_hashes).digest() != h3_hash:
-                                print(f'\n  ⚠ H2 Hashes invalid in chunk {chunk_num}')
-                        
-                        # Decrypt content data (0xFC00 bytes)
-                        content_data = encrypted.read(0xFC00)
-                        iv = h0_hash[0:0x10]
-                        decrypted_data = aes_cbc_decrypt(decrypted_titlekey, iv, content_data)
-                        
-                        # Verify data hash
-                        if hashlib.sha1(decrypted_data).digest() != h0_hash:
-                            print(f'\n  ⚠ Data block hash invalid in chunk {chunk_num}')
-                        
+                    for chunk_num in range(0, chunk_count, DEFAULT_BLOCK_BATCH):
+                        if show:
+                            show_chunk(chunk_num, chunk_count, content_id)
+
+                        span = encrypted.read(min(DEFAULT_BLOCK_BATCH, chunk_count - chunk_num) * 0x10000)
+                        plain, problems = decrypt_hash_tree_span(titlekey, span, h3_hashes, chunk_num)
+                        warnings.extend(problems)
+
                         # Write decrypted data
-                        decrypted.write(hash_tree)
-                        decrypted.write(decrypted_data)
-                        
-                        # Update hash indices
-                        h0_hash_num += 1
-                        if h0_hash_num >= 16:
-                            h0_hash_num = 0
-                            h1_hash_num += 1
-                        if h1_hash_num >= 16:
-                            h1_hash_num = 0
-                            h2_hash_num += 1
-                        if h2_hash_num >= 16:
-                            h2_hash_num = 0
-                            h3_hash_num += 1
-                
-                print('')
-                
+                        decrypted.write(plain)
+
+        else:
+            # Decrypt without hash tree
+            file_size = os.path.getsize(app_file)
+
+            # Create IV: content_index + 14 zero bytes
+            iv = content_index + bytes(14)
+
+            if block_pool is not None and file_size > DEFAULT_FLAT_SEGMENT:
+                content_hash_calc = decrypt_flat_segments(titlekey, app_file, output_file, iv, block_pool,
+                                                          slots=segment_slots)
             else:
-                # Decrypt without hash tree
-                file_size = os.path.getsize(app_file)
-                
-                # Create IV: content_index + 14 zero bytes
-                iv = content_index + bytes(14)
-                
-                content_hash_calc = hashlib.sha1()
-                left = file_size
-                
                 with open(app_file, 'rb') as encrypted, open(output_file, 'wb') as decrypted:
-                    chunk_num = 0
-                    while left > 0:
-                        to_read = min(readsize, left)
-                        
-                        # Show progress
-                        if chunk_num % 10 == 0:
-                            show_progress(file_size - left, file_size, content_id)
-                        
-                        encrypted_content = encrypted.read(to_read)
-                        decrypted_content = aes_cbc_decrypt(decrypted_titlekey, iv, encrypted_content)
-                        
-                        # Update hash
-                        actual_bytes = min(to_read, len(decrypted_content))
-                        content_hash_calc.update(decrypted_content[:actual_bytes])
-                        
-                        # Write decrypted data
-                        decrypted.write(decrypted_content[:actual_bytes])
-                        left -= to_read
-                        chunk_num += 1
-                
-                # Show final progress
+                    content_hash_calc = decrypt_flat_stream(
+                        titlekey, iv, encrypted, decrypted, readsize,
+                        (lambda done: show_progress(done, file_size, content_id)) if show else None)
+
+            # Show final progress
+            if show:
                 show_progress(file_size, file_size, content_id)
-                print('')
-                
-                # Verify hash
-                if content_hash != content_hash_calc.digest():
-                    print(f'  ⚠ Content Hash mismatch for {content_id}')
-                    print(f'    TMD:    {content_hash.hex().upper()}')
-                    print(f'    Result: {content_hash_calc.hexdigest().upper()}')
-            
-            successful += 1
-            print(f'  ✓ Successfully decrypted')
-            
-            # Delete encrypted file if requested
-            if delete_encrypted:
-                try:
-                    os.remove(app_file)
-                    print(f'  ✓ Deleted encrypted file')
-                    h3_file = os.path.join(game_dir, content_id + '.h3')
-                    if os.path.exists(h3_file):
-                        os.remove(h3_file)
-                except Exception as e:
-                    print(f'  ⚠ Could not delete {app_file}: {e}')
-                    
-        except Exception as e:
-            print(f'\n  ❌ Error decrypting {content_id}: {e}')
-            import traceback
-            traceback.print_exc()
-            continue
-    
+
+            # Verify hash
+            if content_hash != content_hash_calc.digest():
+                warnings.append(f'Content Hash mismatch for {content_id}\n'
+                                f'    TMD:    {content_hash.hex().upper()}\n'
+                                f'    Result: {content_hash_calc.hexdigest().upper()}')
+
+        # Delete encrypted file if requested
+        if delete_encrypted:
+            try:
+                os.remove(app_file)
+                h3_file = os.path.join(game_dir, content_id + '.h3')
+                if os.path.exists(h3_file):
+                    os.remove(h3_file)
+                result['deleted'] = True
+            except Exception as e:
+                warnings.append(f'Could not delete {app_file}: {e}')
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        result['status'] = 'error'
+        result['error'] = f'Error decrypting {content_id}: {e}'
+
+    return result
+
+
+def print_content_result(result):
+    """Print the outcome of decrypt_content() for one content"""
+    print('')
+    for warning in result['warnings']:
+        print(f'  ⚠ {warning}')
+    if result['status'] == 'missing':
+        print(f'  ⚠ {result["error"]}')
+    elif result['status'] == 'error':
+        print(f'  ❌ {result["error"]}')
+    else:
+        print(f'  ✓ Successfully decrypted')
+        if result.get('deleted'):
+            print(f'  ✓ Deleted encrypted file')
+
+
+def print_decrypt_summary(results, total, elapsed):
+    """Print the combined outcome of every content"""
+    successful = sum(1 for r in results if r['status'] == 'ok')
+    decrypted_mb = sum(r['size'] for r in results if r['status'] == 'ok') / (1024 * 1024)
+    rate = decrypted_mb / elapsed if elapsed > 0 else 0.0
+    print(f'\nDecrypted {decrypted_mb:.1f} MB in {elapsed:.1f}s ({rate:.1f} MB/s)')
+    for r in results:
+        if r['status'] != 'ok':
+            print(f'  ✗ {r["content_id"]}: {r["error"]}')
+        elif r['warnings']:
+            print(f'  ⚠ {r["content_id"]}: {len(r["warnings"])} warning(s)')
     print(f'\n✅ Decryption complete! {successful}/{total} files decrypted successfully')
-    return successful > 0
 
 
 def main():
@@ -377,6 +868,8 @@ def main():
     parser.add_argument('--key', '-k', help='Path to Wii U common key file (uses hardcoded key by default)')
     parser.add_argument('--output', '-o', help='Output directory for decrypted files')
     parser.add_argument('--delete', '-d', action='store_true', help='Delete encrypted files after decryption')
+    parser.add_argument('--jobs', '-j', type=int, default=DEFAULT_DECRYPT_WORKERS,
+                        help=f'Contents decrypted in parallel (default: {DEFAULT_DECRYPT_WORKERS})')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output')
     
     args = parser.parse_args()
@@ -397,7 +890,7 @@ def main():
         print(f"Files in game directory: {os.listdir(args.game_dir)[:10]}...")
     
     try:
-        success = decrypt_game(args.game_dir, args.output, args.delete)
+        success = decrypt_game(args.game_dir, args.output, args.delete, args.jobs)
         if not success:
             print("\n❌ Decryption failed!")
             sys.exit(1)
@@ -3,6 +3,7 @@
 # fst parser by ihaveamac, with assistance from MarcusD
 
 import binascii
+import io
 import os
 import struct
 import sys
@@ -115,6 +116,153 @@ def iterate_directory(f, iter_start, count, names_offset, depth, topdir, content
         i += 1
 
 
+def parse_fst(fst_data):
+    """
+    Parse a decrypted FST (content 0) held in memory
+
+    Returns (dirs, files): directory paths, and file entries as
+    (path, content_index, offset, size) where offset is in the content's
+    data space (without hash-tree blocks). Deleted entries are skipped.
+    """
+    s = io.BytesIO(fst_data)
+    s.seek(8)
+    exh_count = read_int(s, 4)
+
+    file_entries_offset = 0x20 + exh_count * 0x20
+    s.seek(file_entries_offset + 8)
+    total_entries = read_int(s, 4)
+    names_offset = file_entries_offset + (total_entries * 0x10)
+
+    dirs = []
+    files = []
+    # (index after the directory's last entry, path prefix)
+    tree = [(total_entries, '')]
+
+    for i in range(1, total_entries):
+        while len(tree) > 1 and i >= tree[-1][0]:
+            tree.pop()
+
+        s.seek(file_entries_offset + i * 0x10)
+        f_type = ord(s.read(1))
+        name_offset = read_int(s, 3) + names_offset
+        f_offset = read_int(s, 4)
+        f_size = read_int(s, 4)
+        f_flags = read_int(s, 2)
+        content_index = read_int(s, 2)
+
+        orig_offset = s.tell()
+        s.seek(name_offset)
+        f_name = read_string(s)
+        s.seek(orig_offset)
+
+        if not f_name or f_name in ('.', '..') or '/' in f_name or '\\' in f_name:
+            print(f'  ⚠ Skipping entry {i} with unsafe name {f_name!r}')
+            continue
+
+        path = tree[-1][1] + f_name
+        if f_type & 1:
+            tree.append((f_size, path + '/'))
+            if not f_type & 0x80:
+                dirs.append(path)
+        elif not f_type & 0x80:
+            if not f_flags & 4:
+                f_offset <<= 5
+            files.append((path, content_index, f_offset, f_size))
+
+    return dirs, files
+
+
+class ContentFileRouter:
+    """
+    Write a decrypted content stream straight into its extracted files
+
+    Acts as the output of wiiu_decryptor.ContentStreamDecryptor: decrypted
+    bytes arrive in order, hash-tree blocks are skipped, and every data byte
+    is written into the FST file that covers it. Nothing else is stored.
+    """
+
+    def __init__(self, root_dir, files, has_hash_tree):
+        # (start, end, path) in the content's data space
+        self.entries = sorted((offset, offset + size, os.path.join(root_dir, path))
+                              for path, _, offset, size in files)
+        self.has_hash_tree = has_hash_tree
+        self.seek(0)
+
+    def seek(self, pos):
+        if pos != 0:
+            raise IOError('ContentFileRouter can only restart from the beginning')
+        for handle in getattr(self, 'active', []):
+            handle[2].close()
+        self.position = 0
+        self.next_entry = 0
+        self.active = []
+
+    def truncate(self, size=None):
+        pass
+
+    def write(self, data):
+        view = memoryview(data)
+        if not self.has_hash_tree:
+            self._route(self.position, view)
+        else:
+            pos = 0
+            while pos < len(view):
+                block_pos = (self.position + pos) % 0x10000
+                take = min(len(view) - pos, 0x10000 - block_pos)
+                if block_pos + take > 0x400:
+                    skip = max(0, 0x400 - block_pos)
+                    block = (self.position + pos) // 0x10000
+                    data_offset = block * 0xFC00 + block_pos + skip - 0x400
+                    self._route(data_offset, view[pos + skip:pos + take])
+                pos += take
+        self.position += len(view)
+        return len(view)
+
+    def _route(self, offset, view):
+        end = offset + len(view)
+
+        while self.next_entry < len(self.entries) and self.entries[self.next_entry][0] < end:
+            start, f_end, path = self.entries[self.next_entry]
+            self.active.append([start, f_end, open(path, 'wb')])
+            self.next_entry += 1
+
+        still_active = []
+        for start, f_end, handle in self.active:
+            lo = max(start, offset)
+            hi = min(f_end, end)
+            if hi > lo:
+                handle.write(view[lo - offset:hi - offset])
+            if f_end <= end:
+                handle.close()
+            else:
+                still_active.append([start, f_end, handle])
+        self.active = still_active
+
+    def flush(self):
+        for handle in self.active:
+            handle[2].flush()
+
+    def _close_active(self):
+        for handle in self.active:
+            handle[2].close()
+        self.active = []
+
+    def close(self):
+        """Close open files and create any empty files past the end of the stream"""
+        self._close_active()
+        for start, f_end, path in self.entries[self.next_entry:]:
+            open(path, 'wb').close()
+        self.next_entry = len(self.entries)
+
+    def discard(self):
+        """Remove every file of this content after a failed or cancelled download"""
+        self._close_active()
+        self.next_entry = len(self.entries)
+        for start, f_end, path in self.entries:
+            if os.path.exists(path):
+                os.remove(path)
+
+
 def main(game_dir):
     # Change to the game directory first - this is critical!
     original_dir = os.getcwd()
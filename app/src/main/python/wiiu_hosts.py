@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# wiiu_hosts.py
+
+# Host sets: the same /ccs/download/<title> tree is served by several CDN
+# hosts. A HostSet ranks them by the throughput measured over the session,
+# stripes the byte ranges of one content across them and lets a retry move
+# to the next host in the middle of a download.
+
+import threading
+from urllib.parse import urlsplit
+
+import wiiu_retry
+
+APP_HOST = 'http://ccs.cdn.wup.shop.nintendo.net'
+SYSTEM_HOST = 'http://nus.cdn.wup.shop.nintendo.net'
+TICKET_HOST = 'http://ccs.cdn.c.shop.nintendowifi.net'
+
+# Weight of a new throughput sample in the moving average
+THROUGHPUT_SMOOTHING = 0.3
+
+# Samples shorter than this say more about latency than throughput
+MIN_SAMPLE_BYTES = 256 * 1024
+
+
+class HostStats:
+    """Throughput learned for one host"""
+
+    def __init__(self):
+        self.throughput = None
+        self.bytes = 0
+        self.seconds = 0.0
+        self.failures = 0
+        self.recent_failures = 0
+        self.successes = 0
+
+    def as_dict(self):
+        return {
+            'throughput': self.throughput or 0.0,
+            'bytes': self.bytes,
+            'failures': self.failures,
+            'successes': self.successes,
+        }
+
+
+# Throughput is learned per host name for the whole session, shared by every HostSet
+_learned = {}
+_learned_lock = threading.Lock()
+
+
+def get_host_stats(base):
+    """Return the learned HostStats of the host of a base URL"""
+    host = urlsplit(base).hostname
+    with _learned_lock:
+        stats = _learned.get(host)
+        if stats is None:
+            stats = _learned[host] = HostStats()
+        return stats
+
+
+class HostSet:
+    """
+    Base URLs that serve the same files, best host first
+
+    `bases` are full base URLs (host + path prefix). Hosts start in the
+    given order; once throughput samples come in (from any title) the
+    fastest healthy host is preferred. Hosts whose retry circuit is open
+    are tried last.
+    """
+
+    def __init__(self, bases, policy=None):
+        self.bases = list(bases)
+        self.policy = policy or wiiu_retry.get_policy()
+        self.lock = _learned_lock
+        self.stats = {base: get_host_stats(base) for base in self.bases}
+
+    def path(self, name, preferred=None):
+        """Return a HostPath for a file below every base"""
+        return HostPath(self, name, preferred)
+
+    def _score(self, base):
+        stats = self.stats[base]
+        if stats.throughput is None:
+            # Unmeasured hosts rank above measured ones so they get sampled, unless they failed
+            return 0.0 if stats.recent_failures else float('inf')
+        return stats.throughput / (1 + stats.recent_failures)
+
+    def ranked(self, exclude=()):
+        """Return the bases ordered from best to worst"""
+        with self.lock:
+            candidates = [b for b in self.bases if b not in exclude] or list(self.bases)
+            order = {b: i for i, b in enumerate(self.bases)}
+            healthy = [b for b in candidates if not self.policy.breaker.is_open(urlsplit(b).hostname)]
+            ranked = sorted(healthy, key=lambda b: (-self._score(b), order[b]))
+            return ranked + [b for b in candidates if b not in healthy]
+
+    def stripe(self, count):
+        """
+        Assign `count` byte ranges to hosts
+
+        Uses smooth weighted round robin with the learned throughput as
+        weight, so faster hosts get proportionally more ranges.
+        """
+        ranked = self.ranked()
+        with self.lock:
+            known = [self.stats[b].throughput for b in ranked if self.stats[b].throughput]
+            default = sum(known) / len(known) if known else 1.0
+            weights = {b: self.stats[b].throughput or default for b in ranked}
+        current = {b: 0.0 for b in ranked}
+        total = sum(weights.values())
+        result = []
+        for _ in range(count):
+            for b in ranked:
+                current[b] += weights[b]
+            best = max(ranked, key=lambda b: current[b])
+            current[best] -= total
+            result.append(best)
+        return result
+
+    def record(self, base, nbytes, seconds, ok=True):
+        """Feed one transfer into the learned throughput of base"""
+        with self.lock:
+            stats = self.stats.get(base)
+            if stats is None:
+                return
+            stats.bytes += nbytes
+            stats.seconds += seconds
+            if ok:
+                stats.successes += 1
+                stats.recent_failures = max(0, stats.recent_failures - 1)
+            else:
+                stats.failures += 1
+                stats.recent_failures += 1
+            if nbytes >= MIN_SAMPLE_BYTES and seconds > 0:
+                sample = nbytes / seconds
+                if stats.throughput is None:
+                    stats.throughput = sample
+                else:
+                    stats.throughput += THROUGHPUT_SMOOTHING * (sample - stats.throughput)
+
+    def print_stats(self):
+        if len(self.bases) < 2:
+            return
+        with self.lock:
+            stats = [(base, s.as_dict()) for base, s in self.stats.items()]
+        for base, s in stats:
+            if s['successes'] or s['failures']:
+                print(f"  {urlsplit(base).hostname}: {s['bytes'] / (1024 * 1024):.1f} MB, "
+                      f"{s['throughput'] / (1024 * 1024):.2f} MB/s, {s['failures']} failures")
+
+
+class HostPath:
+    """
+    One file served by every host of a HostSet
+
+    url_for() picks the host of each attempt: the preferred (striped) host
+    first, then the best host that has not failed for this file yet.
+    """
+
+    def __init__(self, hosts, name, preferred=None):
+        self.hosts = hosts
+        self.name = name
+        self.preferred = preferred
+        self.failed = set()
+
+    def url(self, base):
+        return base + '/' + self.name
+
+    def base_of(self, url):
+        return url[:-len(self.name) - 1]
+
+    def url_for(self, attempt):
+        if attempt == 0 and self.preferred and self.preferred not in self.failed:
+            return self.url(self.preferred)
+        return self.url(self.hosts.ranked(exclude=self.failed)[0])
+
+    def mark_failed(self, url):
+        """Remember a failed host, returns True while other hosts are left to try"""
+        self.failed.add(self.base_of(url))
+        return len(self.failed) < len(self.hosts.bases)
+
+    def record(self, url, nbytes, seconds, ok=True):
+        self.hosts.record(self.base_of(url), nbytes, seconds, ok)
+
+    def __str__(self):
+        return self.url(self.preferred or self.hosts.ranked()[0])
+
+
+def content_url(base, name):
+    """Return the URL (or HostPath) of a file below base, a base URL string or HostSet"""
+    if isinstance(base, HostSet):
+        return base.path(name)
+    return base + '/' + name
+
+
+def title_hosts(title_id, app_categories):
+    """HostSet of the CDN hosts serving a title's tmd and contents, the usual host first"""
+    tid = title_id.upper()
+    hosts = [APP_HOST, SYSTEM_HOST] if tid[4:8] in app_categories else [SYSTEM_HOST, APP_HOST]
+    return HostSet(host + '/ccs/download/' + tid for host in hosts)
+
+
+def ticket_hosts(title_id):
+    """HostSet for a title's cetk, the ticket host first then the content hosts"""
+    tid = title_id.lower()
+    return HostSet(host + '/ccs/download/' + tid for host in (TICKET_HOST, APP_HOST, SYSTEM_HOST))
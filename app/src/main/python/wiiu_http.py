@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# wiiu_http.py
+
+# Pooled HTTP/1.1 client for the Nintendo CDN hosts. Connections are kept
+# alive and reused per host, and DNS lookups are cached, so the hundreds of
+# small .h3 and content requests of a large title skip the connect cost.
+
+import http.client
+import socket
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import getproxies, proxy_bypass
+
+# Idle connections kept per host
+DEFAULT_MAX_IDLE_PER_HOST = 8
+
+# Seconds a DNS answer is reused before resolving again
+DEFAULT_DNS_TTL = 300
+
+# Redirects followed before giving up (urlopen follows them too)
+MAX_REDIRECTS = 5
+
+# Errors raised when the server closed a kept-alive connection while it was idle
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+)
+
+
+class DNSCache:
+    """Cache getaddrinfo results for a limited time"""
+
+    def __init__(self, ttl=DEFAULT_DNS_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, host, port):
+        key = (host, port)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        addresses = [info[4] for info in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)]
+        with self.lock:
+            self.entries[key] = (addresses, now + self.ttl)
+        return addresses
+
+    def invalidate(self, host, port):
+        with self.lock:
+            self.entries.pop((host, port), None)
+
+
+def connect_cached(dns_cache, host, port, timeout, source_address=None):
+    """Open a socket to host:port trying every cached address in order"""
+    last_error = None
+    for address in dns_cache.resolve(host, port):
+        try:
+            return socket.create_connection(address[:2], timeout, source_address)
+        except OSError as e:
+            last_error = e
+    dns_cache.invalidate(host, port)
+    raise last_error or OSError(f"Could not resolve {host}")
+
+
+class CachedDNSHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that resolves its host through a DNSCache"""
+
+    def __init__(self, *args, dns_cache=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+
+    def connect(self):
+        self.sock = connect_cached(self.dns_cache, self.host, self.port, self.timeout, self.source_address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self._tunnel_host:
+            self._tunnel()
+
+
+class CachedDNSHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPSConnection that resolves its host through a DNSCache"""
+
+    def __init__(self, *args, dns_cache=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+
+    def connect(self):
+        self.sock = connect_cached(self.dns_cache, self.host, self.port, self.timeout, self.source_address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        server_hostname = self.host
+        if self._tunnel_host:
+            self._tunnel()
+            server_hostname = self._tunnel_host
+        self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname)
+
+
+class HostStats:
+    """Connection statistics for one host"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connects = 0
+        self.reuses = 0
+        self.stale = 0
+        self.connect_time = 0.0
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'connects': self.connects,
+            'reuses': self.reuses,
+            'stale_retries': self.stale,
+            'reuse_rate': self.reuses / self.requests if self.requests else 0.0,
+            'avg_connect_ms': (self.connect_time / self.connects) * 1000 if self.connects else 0.0,
+        }
+
+
+class PooledResponse:
+    """
+    Response from a pooled connection
+
+    Behaves like the object returned by urlopen (status, headers, read,
+    readinto, close). The connection goes back to the pool as soon as the
+    body has been read completely; closing early discards it instead.
+    """
+
+    def __init__(self, pool, key, conn, response, url):
+        self.pool = pool
+        self.key = key
+        self.conn = conn
+        self.response = response
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+    def getcode(self):
+        return self.status
+
+    def _check_done(self):
+        if self.conn is not None and self.response.isclosed():
+            self.pool._release(self.key, self.conn, reusable=not self.response.will_close)
+            self.conn = None
+
+    def read(self, amt=None):
+        data = self.response.read(amt)
+        self._check_done()
+        return data
+
+    def readinto(self, b):
+        n = self.response.readinto(b)
+        self._check_done()
+        return n
+
+    def close(self):
+        if self.conn is not None:
+            # Unread body left on the socket, the connection cannot be reused
+            self.conn.close()
+            self.conn = None
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP/1.1 connection pool keyed per host
+
+    Safe to share between threads. Proxies from the environment are honoured
+    the same way urlopen does.
+    """
+
+    def __init__(self, max_idle_per_host=DEFAULT_MAX_IDLE_PER_HOST, timeout=None, dns_ttl=DEFAULT_DNS_TTL):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.dns_cache = DNSCache(dns_ttl)
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.host_stats = {}
+        self.proxies = getproxies()
+
+    def _route(self, scheme, host, port):
+        """Return (connect_scheme, connect_host, connect_port, via_proxy)"""
+        proxy = self.proxies.get(scheme)
+        if proxy and not proxy_bypass(host):
+            parts = urlsplit(proxy if '://' in proxy else 'http://' + proxy)
+            return parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80), True
+        return scheme, host, port, False
+
+    def _stats(self, host):
+        stats = self.host_stats.get(host)
+        if stats is None:
+            stats = self.host_stats[host] = HostStats()
+        return stats
+
+    def _acquire(self, key, timeout):
+        """Return (connection, reused)"""
+        scheme, host, port, via_proxy, conn_scheme, conn_host, conn_port = key
+        with self.lock:
+            idle = self.idle.get(key)
+            if idle:
+                self._stats(host).reuses += 1
+                conn = idle.pop()
+                # The connection keeps the timeout it was opened with unless this request has its own
+                if timeout is not None and conn.sock is not None:
+                    conn.timeout = timeout
+                    conn.sock.settimeout(timeout)
+                return conn, True
+
+        conn_class = CachedDNSHTTPSConnection if conn_scheme == 'https' else CachedDNSHTTPConnection
+        kwargs = {'dns_cache': self.dns_cache}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        conn = conn_class(conn_host, conn_port, **kwargs)
+        if via_proxy and scheme == 'https':
+            conn.set_tunnel(host, port)
+
+        start = time.monotonic()
+        conn.connect()
+        elapsed = time.monotonic() - start
+        with self.lock:
+            stats = self._stats(host)
+            stats.connects += 1
+            stats.connect_time += elapsed
+        return conn, False
+
+    def _release(self, key, conn, reusable=True):
+        if reusable and conn.sock is not None:
+            with self.lock:
+                idle = self.idle.setdefault(key, [])
+                if len(idle) < self.max_idle_per_host:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    def request(self, url, headers=None, timeout=None):
+        """
+        Send a GET request and return a PooledResponse
+
+        Raises urllib.error.HTTPError for 4xx/5xx answers like urlopen.
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._request_once(url, headers or {}, timeout)
+            if response.status in (301, 302, 303, 307, 308) and response.headers.get('Location'):
+                location = response.headers['Location']
+                response.read()
+                response.close()
+                url = location if '://' in location else urlsplit(url)._replace(path=location, query='').geturl()
+                continue
+            if response.status >= 400:
+                body = response.response
+                response.conn, conn = None, response.conn
+                if conn is not None:
+                    conn.close()
+                raise HTTPError(url, response.status, response.reason, response.headers, body)
+            return response
+        raise HTTPError(url, 310, 'Too many redirects', None, None)
+
+    def _request_once(self, url, headers, timeout):
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        host = parts.hostname
+        port = parts.port or (443 if scheme == 'https' else 80)
+        conn_scheme, conn_host, conn_port, via_proxy = self._route(scheme, host, port)
+        key = (scheme, host, port, via_proxy, conn_scheme, conn_host, conn_port)
+
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        if via_proxy and scheme == 'http':
+            path = url
+
+        request_headers = {'Host': parts.netloc, 'Connection': 'keep-alive'}
+        request_headers.update(headers)
+
+        while True:
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.request('GET', path, headers=request_headers)
+                response = conn.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                # The server dropped an idle keep-alive connection, try a fresh one
+                with self.lock:
+                    self._stats(host).stale += 1
+                continue
+            except Exception:
+                conn.close()
+                raise
+
+            with self.lock:
+                self._stats(host).requests += 1
+            return PooledResponse(self, key, conn, response, url)
+
+    def stats(self):
+        """Return per-host and total connection statistics"""
+        with self.lock:
+            hosts = {host: s.as_dict() for host, s in self.host_stats.items()}
+            total = HostStats()
+            for s in self.host_stats.values():
+                total.requests += s.requests
+                total.connects += s.connects
+                total.reuses += s.reuses
+                total.stale += s.stale
+                total.connect_time += s.connect_time
+            idle = sum(len(v) for v in self.idle.values())
+        result = total.as_dict()
+        result['idle_connections'] = idle
+        result['dns_hits'] = self.dns_cache.hits
+        result['dns_misses'] = self.dns_cache.misses
+        result['hosts'] = hosts
+        return result
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"Connection pool: {s['requests']} requests, {s['connects']} connects, "
+              f"{s['reuse_rate'] * 100:.0f}% reused, avg connect {s['avg_connect_ms']:.0f} ms")
+        for host, h in s['hosts'].items():
+            print(f"  {host}: {h['requests']} requests, {h['reuse_rate'] * 100:.0f}% reused, "
+                  f"avg connect {h['avg_connect_ms']:.0f} ms")
+
+    def close(self):
+        """Close every idle connection"""
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+        return _default_pool
+
+
+def open_url(url, headers=None, timeout=None, pool=None):
+    """Drop-in for urlopen(url) that goes through the connection pool"""
+    return (pool or get_pool()).request(url, headers=headers, timeout=timeout)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# wiiu_metacache.py
+
+# On-disk cache for the small metadata files of a title (tmd, cetk). An
+# entry younger than the TTL is answered without touching the network;
+# an older one is revalidated with If-None-Match / If-Modified-Since when
+# the CDN sent validators, and fetched again otherwise. When the CDN cannot
+# be reached a cached copy is used even if it is stale.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import wiiu_retry
+from wiiu_http import open_url
+from wiiu_transfer import is_cancelled
+
+# Seconds a cached file is used without asking the CDN
+DEFAULT_TTL = 3600
+
+# Seconds without data before a metadata request fails
+DEFAULT_TIMEOUT = 30
+
+# Returned by an attempt when the server answered 304 Not Modified
+NOT_MODIFIED = object()
+
+
+class FetchCancelled(Exception):
+    """Raised by MetadataCache.fetch when the cancellation token fires between attempts"""
+
+
+class MetadataCache:
+    """
+    Cache of metadata files in a directory
+
+    Entries are keyed by the URL path, so the same file served by another
+    host of a wiiu_hosts.HostSet is one entry. Safe to share between threads.
+    """
+
+    def __init__(self, root, ttl=DEFAULT_TTL):
+        self.root = root
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _paths(self, url):
+        name = hashlib.sha1(urlsplit(str(url)).path.encode()).hexdigest()
+        return os.path.join(self.root, name + '.bin'), os.path.join(self.root, name + '.json')
+
+    def _load(self, url):
+        """Return (data, meta) of a cached file or (None, None)"""
+        data_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(data_path, 'rb') as f:
+                data = f.read()
+        except (OSError, ValueError):
+            return None, None
+        if len(data) != meta.get('size'):
+            return None, None
+        return data, meta
+
+    def _save(self, url, data, meta):
+        data_path, meta_path = self._paths(url)
+        meta['size'] = len(data)
+        # Write to temporary names so a concurrent reader never sees half an entry
+        suffix = f'.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(data_path + suffix, 'wb') as f:
+                f.write(data)
+            with open(meta_path + suffix, 'w') as f:
+                json.dump(meta, f)
+            os.replace(data_path + suffix, data_path)
+            os.replace(meta_path + suffix, meta_path)
+        except OSError as e:
+            # The file was downloaded fine, only the next run has to fetch it again
+            print(f"  ⚠ Could not cache {meta.get('url', url)}: {e}")
+
+    def _count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def fetch(self, url, max_retries=3, retry_delay=2, max_age=None, token=None):
+        """
+        Return the bytes of a metadata file, from the cache when possible
+
+        `url` is a URL string or a wiiu_hosts.HostPath. `max_age` overrides
+        the TTL for this call (0 always asks the CDN). A cancelled `token`
+        raises FetchCancelled before the next request.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        data, meta = self._load(url)
+        if data is not None and time.time() - meta['fetched'] < max_age:
+            self._count('hits')
+            return data
+
+        headers = {}
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        def attempt(n, current):
+            if is_cancelled(token):
+                raise FetchCancelled(f"Cancelled while fetching {urlsplit(current).path}")
+            with open_url(current, headers=headers, timeout=DEFAULT_TIMEOUT) as response:
+                body = response.read()
+                if response.status == 304:
+                    return NOT_MODIFIED
+                length = response.headers.get('Content-Length')
+                if length is not None and len(body) != int(length):
+                    raise IOError(f"Connection closed after {len(body)} of {length} bytes")
+                return body, response.headers
+
+        try:
+            result = wiiu_retry.get_policy().run(url, attempt, max_retries=max_retries, base_delay=retry_delay,
+                                                 passthrough=(FetchCancelled,))
+        except FetchCancelled:
+            raise
+        except Exception as e:
+            if data is None or wiiu_retry.classify_error(e) == wiiu_retry.PERMANENT:
+                raise
+            print(f"  ⚠ Could not refresh {urlsplit(str(url)).path} ({e}), using cached copy")
+            self._count('stale')
+            return data
+
+        if result is NOT_MODIFIED and data is not None:
+            meta['fetched'] = time.time()
+            self._save(url, data, meta)
+            self._count('revalidated')
+            return data
+
+        body, response_headers = result
+        self._save(url, body, {
+            'url': str(url),
+            'fetched': time.time(),
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+        })
+        self._count('misses')
+        return body
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.revalidated + self.misses + self.stale
+            return {
+                'hits': self.hits,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+                'stale': self.stale,
+                'hit_rate': (self.hits + self.revalidated) / lookups if lookups else 0.0,
+            }
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"Metadata cache: {s['hits']} hits, {s['revalidated']} revalidated, {s['misses']} misses"
+              + (f", {s['stale']} stale" if s['stale'] else ""))
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(root, ttl=DEFAULT_TTL):
+    """Return the MetadataCache for a directory, shared by every title of the session"""
+    root = os.path.abspath(root)
+    with _caches_lock:
+        cache = _caches.get(root)
+        if cache is None:
+            cache = _caches[root] = MetadataCache(root, ttl)
+        cache.ttl = ttl
+        return cache
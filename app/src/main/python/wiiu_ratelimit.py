@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# wiiu_ratelimit.py
+
+# Token-bucket bandwidth limiting for content downloads. One global bucket
+# is shared by every download, and each title can get its own bucket on
+# top of it. Rates can be changed at any time, running downloads pick up
+# the new rate on their next read.
+
+import threading
+import time
+
+# Seconds of traffic a bucket may burst at full rate
+DEFAULT_BURST_SECONDS = 0.25
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket measured in bytes
+
+    A rate of None or 0 means unlimited. The bucket may go into debt: a read
+    larger than the available tokens is allowed, and the caller sleeps the
+    time needed to pay it back.
+    """
+
+    def __init__(self, rate=None, burst_seconds=DEFAULT_BURST_SECONDS, name='global'):
+        self.name = name
+        self.burst_seconds = burst_seconds
+        self.lock = threading.Lock()
+        self.rate = None
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.total_bytes = 0
+        self.waited = 0.0
+        self.first = None
+        self.last = None
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """Change the rate in bytes per second, None or 0 for unlimited"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate) if rate else None
+            if self.rate:
+                self.tokens = min(self.tokens, self.rate * self.burst_seconds)
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.rate * self.burst_seconds)
+        self.updated = now
+
+    def reserve(self, nbytes):
+        """Take nbytes from the bucket and return the seconds the caller has to wait"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.first is None:
+                self.first = now
+            self.last = now
+            self.total_bytes += nbytes
+            if not self.rate:
+                return 0.0
+            self.tokens -= nbytes
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited += delay
+            return delay
+
+    def reset_stats(self):
+        with self.lock:
+            self.total_bytes = 0
+            self.waited = 0.0
+            self.first = self.last = None
+
+    def throughput(self):
+        """Achieved bytes per second between the first and last read"""
+        with self.lock:
+            if self.first is None or self.last <= self.first:
+                return 0.0
+            return self.total_bytes / (self.last - self.first)
+
+    def stats(self):
+        rate = self.rate
+        return {
+            'name': self.name,
+            'rate': rate,
+            'bytes': self.total_bytes,
+            'throughput': self.throughput(),
+            'waited': self.waited,
+        }
+
+
+class Throttle:
+    """Several buckets applied together, the slowest one sets the pace"""
+
+    def __init__(self, *buckets):
+        self.buckets = [b for b in buckets if b is not None]
+
+    def reserve(self, nbytes):
+        delay = 0.0
+        for bucket in self.buckets:
+            delay = max(delay, bucket.reserve(nbytes))
+        return delay
+
+    def consume(self, nbytes):
+        """Account nbytes, sleep until the slowest bucket allows them and return the seconds slept"""
+        delay = self.reserve(nbytes)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def print_stats(self):
+        for bucket in self.buckets:
+            s = bucket.stats()
+            limit = f"{s['rate'] / (1024 * 1024):.2f} MB/s" if s['rate'] else "unlimited"
+            print(f"Bandwidth ({s['name']}): limit {limit}, achieved {s['throughput'] / (1024 * 1024):.2f} MB/s, "
+                  f"waited {s['waited']:.1f}s across workers")
+
+
+_global_bucket = TokenBucket()
+_title_buckets = {}
+_title_lock = threading.Lock()
+
+
+def get_global_limiter():
+    """Return the bucket shared by every download"""
+    return _global_bucket
+
+
+def set_global_rate(rate):
+    """Limit all downloads together to rate bytes per second (None for unlimited)"""
+    _global_bucket.set_rate(rate)
+
+
+def get_title_limiter(title_id):
+    """Return the bucket of one title, created unlimited on first use"""
+    tid = title_id.upper()
+    with _title_lock:
+        bucket = _title_buckets.get(tid)
+        if bucket is None:
+            bucket = _title_buckets[tid] = TokenBucket(name=tid)
+        return bucket
+
+
+def set_title_rate(title_id, rate):
+    """Limit one title to rate bytes per second (None for unlimited)"""
+    get_title_limiter(title_id).set_rate(rate)
+
+
+def title_throttle(title_id):
+    """Return the Throttle applying the global and the title bucket"""
+    return Throttle(_global_bucket, get_title_limiter(title_id))
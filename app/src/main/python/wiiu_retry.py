@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# wiiu_retry.py
+
+# Retry policy for CDN requests: failures are classified as permanent
+# (4xx, a missing .h3 or cetk) or transient (5xx, timeouts, resets, short
+# bodies), transient ones are retried with exponential backoff and full
+# jitter, and a per-host circuit breaker stops hammering a host that keeps
+# failing. Every request's outcome is counted, and the attempts of the
+# most recent ones are kept for later analysis.
+
+import asyncio
+import collections
+import contextlib
+import http.client
+import random
+import socket
+import threading
+import time
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+
+# Upper bound of one backoff sleep in seconds
+DEFAULT_MAX_DELAY = 30.0
+
+# Consecutive transient failures that open a host's circuit
+DEFAULT_FAILURE_THRESHOLD = 5
+
+# Seconds an open circuit rejects requests before letting one through again
+DEFAULT_COOLDOWN = 15.0
+
+# Requests whose attempts and errors RetryStats keeps, older ones only count in the totals
+DEFAULT_RECENT_REQUESTS = 256
+
+# HTTP statuses worth retrying even though they are 4xx
+TRANSIENT_HTTP_STATUSES = (408, 425, 429)
+
+PERMANENT = 'permanent'
+TRANSIENT = 'transient'
+
+
+class CircuitOpenError(IOError):
+    """Raised instead of sending a request to a host whose circuit is open"""
+
+
+class LocalFileError(OSError):
+    """Raised when a download cannot be written to disk (full, read-only, ...), the host is not at fault"""
+
+
+@contextlib.contextmanager
+def local_writes():
+    """Report OSErrors raised by writes to a local file as LocalFileError"""
+    try:
+        yield
+    except LocalFileError:
+        raise
+    except OSError as e:
+        # Errors without errno are the writer's own (a stream decryptor failing verification)
+        if e.errno is None:
+            raise
+        raise LocalFileError(e.errno, f"Cannot write download: {e.strerror}") from e
+
+
+def classify_error(error):
+    """Return PERMANENT or TRANSIENT for an exception raised by a download"""
+    if isinstance(error, LocalFileError):
+        return PERMANENT
+    if isinstance(error, HTTPError):
+        if error.code >= 500 or error.code in TRANSIENT_HTTP_STATUSES:
+            return TRANSIENT
+        return PERMANENT
+    if isinstance(error, URLError):
+        return TRANSIENT
+    if isinstance(error, (socket.timeout, ConnectionError, http.client.HTTPException, OSError)):
+        # OSError covers IOError: short bodies, resets, DNS failures
+        return TRANSIENT
+    return PERMANENT
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker
+
+    After `failure_threshold` consecutive transient failures the host's
+    circuit opens and requests fail fast for `cooldown` seconds. The first
+    request after the cooldown is let through; it closes the circuit again
+    on success or reopens it on failure.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, cooldown=DEFAULT_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = {}
+        self.opened = {}
+
+    def allow(self, host):
+        """Raise CircuitOpenError if the host is not accepting requests"""
+        with self.lock:
+            opened = self.opened.get(host)
+            if opened is None:
+                return
+            remaining = opened + self.cooldown - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(f"Circuit open for {host}, retrying in {remaining:.0f}s")
+            # Half-open: let this request through, a failure reopens right away
+            del self.opened[host]
+            self.failures[host] = self.failure_threshold - 1
+
+    def record_success(self, host):
+        with self.lock:
+            self.failures.pop(host, None)
+            self.opened.pop(host, None)
+
+    def record_failure(self, host):
+        with self.lock:
+            count = self.failures.get(host, 0) + 1
+            self.failures[host] = count
+            if count >= self.failure_threshold and host not in self.opened:
+                self.opened[host] = time.monotonic()
+                print(f"  ⚠ {host} failed {count} times in a row, pausing requests for {self.cooldown:.0f}s")
+
+    def is_open(self, host):
+        with self.lock:
+            opened = self.opened.get(host)
+            return opened is not None and opened + self.cooldown > time.monotonic()
+
+
+class RetryStats:
+    """Totals over every request made through the retry policy, details of the `recent` last ones"""
+
+    def __init__(self, recent=DEFAULT_RECENT_REQUESTS):
+        self.lock = threading.Lock()
+        self.requests = collections.deque(maxlen=recent)
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+            self.total = 0
+            self.retried = 0
+            self.retries = 0
+            self.failures = {PERMANENT: 0, TRANSIENT: 0}
+
+    def record(self, url, attempts, outcome, errors):
+        with self.lock:
+            self.total += 1
+            self.retried += 1 if attempts > 1 else 0
+            self.retries += attempts - 1
+            if outcome in self.failures:
+                self.failures[outcome] += 1
+            self.requests.append({
+                'url': url,
+                'attempts': attempts,
+                'retries': attempts - 1,
+                'outcome': outcome,
+                'errors': errors,
+            })
+
+    def _totals(self):
+        return {
+            'requests': self.total,
+            'retried_requests': self.retried,
+            'retries': self.retries,
+            'permanent_failures': self.failures[PERMANENT],
+            'transient_failures': self.failures[TRANSIENT],
+        }
+
+    def as_dict(self):
+        with self.lock:
+            result = self._totals()
+            result['per_request'] = list(self.requests)
+        return result
+
+    def print_stats(self):
+        with self.lock:
+            s = self._totals()
+        print(f"Retries: {s['retries']} over {s['retried_requests']}/{s['requests']} requests, "
+              f"{s['permanent_failures']} permanent and {s['transient_failures']} transient failures")
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter
+
+    The sleep before retry n is uniform in [0, min(max_delay, base_delay * 2**n)].
+    """
+
+    def __init__(self, max_delay=DEFAULT_MAX_DELAY, breaker=None, stats=None):
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = stats or RetryStats()
+
+    def backoff(self, attempt, base_delay):
+        return random.uniform(0, min(self.max_delay, base_delay * (2 ** attempt)))
+
+    def _failed(self, url, current, error, attempt, max_retries, errors, base_delay):
+        """Record a failed attempt, return the backoff delay or re-raise when giving up"""
+        host = urlsplit(current).hostname
+        kind = classify_error(error)
+        errors.append(f"{host}: {type(error).__name__}: {error}")
+        if kind == TRANSIENT and not isinstance(error, CircuitOpenError):
+            self.breaker.record_failure(host)
+        # A file served by several hosts moves on to the next one right away, unless the disk failed
+        other_host = (not isinstance(error, LocalFileError) and hasattr(url, 'mark_failed')
+                      and url.mark_failed(current))
+        if kind == PERMANENT and not other_host:
+            self.stats.record(str(url), attempt + 1, PERMANENT, errors)
+            raise error
+        if attempt >= max_retries - 1:
+            print(f"  ✗ Failed after {attempt + 1} attempts: {error}")
+            self.stats.record(str(url), attempt + 1, kind, errors)
+            raise error
+        if other_host:
+            # Backing off only spares the failing host, the next one can go right away
+            print(f"  ↻ {host} failed ({error}), trying another host")
+            return 0
+        delay = self.backoff(attempt, base_delay)
+        print(f"  ↻ Retry {attempt + 1}/{max_retries} in {delay:.1f}s...")
+        return delay
+
+    def run(self, url, attempt_fn, max_retries=3, base_delay=1.0, passthrough=()):
+        """
+        Call attempt_fn(attempt, current_url) until it succeeds, a permanent
+        error occurs or max_retries attempts are used up
+
+        `url` is a URL string or a wiiu_hosts.HostPath, which picks the host
+        of every attempt and fails over to another host after an error.
+        Exceptions of the `passthrough` types are signals for the caller, they
+        are raised unchanged and not counted as failures.
+        """
+        errors = []
+        max_retries = max(1, int(max_retries))
+        for attempt in range(max_retries):
+            current = url.url_for(attempt) if hasattr(url, 'url_for') else url
+            try:
+                self.breaker.allow(urlsplit(current).hostname)
+                result = attempt_fn(attempt, current)
+            except passthrough:
+                raise
+            except Exception as e:
+                delay = self._failed(url, current, e, attempt, max_retries, errors, base_delay)
+                if delay:
+                    time.sleep(delay)
+                continue
+            self.breaker.record_success(urlsplit(current).hostname)
+            self.stats.record(str(url), attempt + 1, 'ok', errors)
+            return result
+        return None
+
+    async def run_async(self, url, attempt_fn, max_retries=3, base_delay=1.0, passthrough=()):
+        """run() for coroutines: awaits attempt_fn(attempt, current_url) and sleeps on the event loop"""
+        errors = []
+        max_retries = max(1, int(max_retries))
+        for attempt in range(max_retries):
+            current = url.url_for(attempt) if hasattr(url, 'url_for') else url
+            try:
+                self.breaker.allow(urlsplit(current).hostname)
+                result = await attempt_fn(attempt, current)
+            except passthrough:
+                raise
+            except Exception as e:
+                delay = self._failed(url, current, e, attempt, max_retries, errors, base_delay)
+                if delay:
+                    await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success(urlsplit(current).hostname)
+            self.stats.record(str(url), attempt + 1, 'ok', errors)
+            return result
+        return None
+
+
+_default_policy = RetryPolicy()
+
+
+def get_policy():
+    """Return the process-wide retry policy"""
+    return _default_policy
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# wiiu_store.py
+
+# Content-addressed store for downloaded .app (and .h3) files. Entries are
+# keyed by the SHA-1 and size from the TMD content record, so a title
+# downloaded again into another work directory, or after a cleanup, is
+# linked from the store instead of fetched from the CDN. The store has a
+# size cap and evicts the least recently used entries.
+
+import binascii
+import errno
+import os
+import shutil
+import threading
+
+# Default size cap of the store
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024 * 1024
+
+# Linux FICLONE ioctl (copy-on-write clone on btrfs/xfs)
+FICLONE = 0x40049409
+
+
+def reflink(src, dst):
+    """Clone src into dst copy-on-write, raises OSError where unsupported"""
+    import fcntl
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+
+
+def link_file(src, dst):
+    """
+    Make dst a copy of src as cheaply as possible
+
+    Tries a reflink, then a hardlink, then a plain copy. Returns the method used.
+    """
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        reflink(src, dst)
+        return 'reflink'
+    except (OSError, ImportError):
+        pass
+    try:
+        os.link(src, dst)
+        return 'hardlink'
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EACCES, errno.EMLINK, errno.ENOTSUP):
+            raise
+    shutil.copyfile(src, dst)
+    return 'copy'
+
+
+class ContentStore:
+    """
+    Directory of content files named by their key
+
+    Access time is tracked through the file mtime, which eviction uses to
+    drop the least recently used entries once the store is over max_bytes.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(title_id, content):
+        """
+        Key of one content record
+
+        The TMD hash and size identify the content; the stored bytes are
+        encrypted with the title key and the content index as IV, so the
+        title ID and index are part of the key too.
+        """
+        content_size, content_index, content_hash = content[2], content[3], content[4]
+        return (f"{binascii.hexlify(content_hash).decode()}-{content_size:x}-"
+                f"{title_id.upper()}-{binascii.hexlify(content_index).decode()}")
+
+    def entry_path(self, key, suffix='.app'):
+        return os.path.join(self.root, key[:2], key + suffix)
+
+    def contains(self, key, size, with_h3=False):
+        """True if fetch() would find the content, without linking it"""
+        src = self.entry_path(key)
+        return (os.path.exists(src) and os.path.getsize(src) == size
+                and (not with_h3 or os.path.exists(self.entry_path(key, '.h3'))))
+
+    def same_device(self, path):
+        """True if files in path can be linked from the store without copying"""
+        try:
+            return os.stat(self.root).st_dev == os.stat(path).st_dev
+        except OSError:
+            return False
+
+    def fetch(self, key, size, app_path, h3_path=None):
+        """Link a stored content into app_path (and its .h3), returns True on a hit"""
+        src = self.entry_path(key)
+        src_h3 = self.entry_path(key, '.h3')
+        if not self.contains(key, size, h3_path is not None):
+            with self.lock:
+                self.misses += 1
+            return False
+
+        try:
+            method = link_file(src, app_path)
+            if h3_path is not None:
+                link_file(src_h3, h3_path)
+            os.utime(src)
+        except OSError as e:
+            print(f"  ⚠ Could not use stored content: {e}")
+            with self.lock:
+                self.misses += 1
+            return False
+
+        with self.lock:
+            self.hits += 1
+            self.bytes_saved += size
+        print(f"  ✓ Found in content store ({method})")
+        return True
+
+    def add(self, key, app_path, h3_path=None):
+        """Put a downloaded content into the store and evict old entries if over the cap"""
+        dst = self.entry_path(key)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        try:
+            if h3_path is not None:
+                link_file(h3_path, self.entry_path(key, '.h3'))
+            # Link to a temporary name first so a half-written entry is never found
+            link_file(app_path, dst + '.tmp')
+            os.replace(dst + '.tmp', dst)
+        except OSError as e:
+            print(f"  ⚠ Could not add {os.path.basename(app_path)} to the content store: {e}")
+            return
+        self.evict()
+
+    def remove(self, key):
+        """Drop one stored content (and its .h3), returns True if it was there"""
+        removed = False
+        for path in (self.entry_path(key), self.entry_path(key, '.h3')):
+            if os.path.exists(path):
+                os.remove(path)
+                removed = True
+        return removed
+
+    def entries(self):
+        """Return [(mtime, size, path)] of every stored content"""
+        result = []
+        for sub in os.listdir(self.root):
+            subdir = os.path.join(self.root, sub)
+            if not os.path.isdir(subdir):
+                continue
+            for name in os.listdir(subdir):
+                if name.endswith('.app'):
+                    path = os.path.join(subdir, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    h3 = path[:-4] + '.h3'
+                    size = st.st_size + (os.path.getsize(h3) if os.path.exists(h3) else 0)
+                    result.append((st.st_mtime, size, path))
+        return result
+
+    def evict(self):
+        """Remove least recently used contents until the store fits max_bytes"""
+        with self.lock:
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            for mtime, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                for victim in (path, path[:-4] + '.h3'):
+                    if os.path.exists(victim):
+                        os.remove(victim)
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'evictions': self.evictions,
+            }
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"Content store: {s['hits']} hits, {s['misses']} misses, "
+              f"{s['bytes_saved'] / (1024 * 1024):.1f} MB not downloaded, {s['evictions']} evicted")
+
+    def for_title(self, title_id, titlekey=None):
+        return TitleContentStore(self, title_id, titlekey)
+
+
+class TitleContentStore:
+    """
+    ContentStore view for the contents of one title
+
+    `titlekey` (decrypted) lets the caller verify a content against the TMD
+    before add(); without it nothing can be checked and nothing should be added.
+    """
+
+    def __init__(self, store, title_id, titlekey=None):
+        self.store = store
+        self.title_id = title_id
+        self.titlekey = titlekey
+
+    def contains(self, content):
+        return self.store.contains(self.store.key(self.title_id, content), content[2], bool(content[1] & 0x2))
+
+    def same_device(self, path):
+        return self.store.same_device(path)
+
+    def fetch(self, content, app_path, h3_path=None):
+        return self.store.fetch(self.store.key(self.title_id, content), content[2], app_path, h3_path)
+
+    def add(self, content, app_path, h3_path=None):
+        self.store.add(self.store.key(self.title_id, content), app_path, h3_path)
+
+    def remove(self, content):
+        return self.store.remove(self.store.key(self.title_id, content))
+
+    def print_stats(self):
+        self.store.print_stats()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(root, max_bytes=DEFAULT_MAX_BYTES):
+    """Return the ContentStore for a directory, shared by every title of the session"""
+    root = os.path.abspath(root)
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = ContentStore(root, max_bytes)
+        store.max_bytes = max_bytes
+        return store
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# wiiu_transfer.py
+
+# Pieces of the content download loop shared by the thread engine (runner)
+# and the asyncio engine (wiiu_async): stall detection, transfer settings,
+# read loop counters, cancellation, aggregate content progress and the
+# <file>.part progress of segmented downloads.
+
+import json
+import os
+import threading
+import time
+
+# Bytes read from the socket per readinto() call
+DEFAULT_READ_SIZE = 64 * 1024
+
+# Seconds without a single byte before a connection counts as stalled
+DEFAULT_STALL_TIMEOUT = 30
+
+# Bytes per second a connection must keep up over STALL_WINDOW seconds (0 disables the floor)
+DEFAULT_MIN_THROUGHPUT = 0
+STALL_WINDOW = 15
+
+# Most progress updates per second sent to the bridge while contents download
+DEFAULT_PROGRESS_RATE = 5
+
+# Seconds between two checks of the (JNI) cancellation token
+CANCEL_POLL_INTERVAL = 0.25
+
+
+class RangeNotSupportedError(Exception):
+    """Raised when the server answers a Range request with the full body"""
+
+
+class StallError(IOError):
+    """Raised when a connection stops delivering, the retry resumes on a new connection"""
+
+
+class StallMonitor:
+    """Raise StallError when a transfer stays below min_throughput for a whole window"""
+
+    def __init__(self, min_throughput=None, window=None):
+        self.min_throughput = DEFAULT_MIN_THROUGHPUT if min_throughput is None else min_throughput
+        self.window = window or STALL_WINDOW
+        self.window_start = time.monotonic()
+        self.window_bytes = 0
+
+    def pause(self, seconds):
+        """Leave time spent waiting on the bandwidth limiter out of the window"""
+        self.window_start += seconds
+
+    def update(self, nbytes):
+        if not self.min_throughput:
+            return
+        self.window_bytes += nbytes
+        elapsed = time.monotonic() - self.window_start
+        if elapsed >= self.window:
+            rate = self.window_bytes / elapsed
+            if rate < self.min_throughput:
+                raise StallError(f"Transfer stalled at {rate / 1024:.1f} KB/s")
+            self.window_start = time.monotonic()
+            self.window_bytes = 0
+
+
+class TransferSettings:
+    """Read size and stall detection of the downloads of one job"""
+
+    def __init__(self, read_size=DEFAULT_READ_SIZE, stall_timeout=DEFAULT_STALL_TIMEOUT,
+                 min_throughput=DEFAULT_MIN_THROUGHPUT):
+        self.read_size = read_size
+        self.stall_timeout = stall_timeout
+        self.min_throughput = min_throughput
+
+
+class DownloadStats:
+    """Count bytes, socket reads and buffer allocations of the download loop"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.reads = 0
+        self.allocations = 0
+
+    def add(self, nbytes, reads, allocations):
+        with self.lock:
+            self.bytes += nbytes
+            self.reads += reads
+            self.allocations += allocations
+
+    def as_dict(self):
+        with self.lock:
+            mb = self.bytes / (1024 * 1024)
+            return {
+                'bytes': self.bytes,
+                'reads': self.reads,
+                'allocations': self.allocations,
+                'reads_per_mb': self.reads / mb if mb else 0.0,
+                'allocations_per_mb': self.allocations / mb if mb else 0.0,
+            }
+
+    def print_stats(self):
+        s = self.as_dict()
+        print(f"Read loop: {s['bytes'] / (1024 * 1024):.1f} MB in {s['reads']} reads, "
+              f"{s['reads_per_mb']:.1f} reads/MB, {s['allocations_per_mb']:.3f} buffer allocations/MB")
+
+
+download_stats = DownloadStats()
+
+
+def load_segment_state(file_path, content_size):
+    """Load the per-segment progress of an interrupted segmented download"""
+    part_path = file_path + '.part'
+    try:
+        with open(part_path, 'r') as f:
+            state = json.load(f)
+        if state.get('size') == content_size and os.path.getsize(file_path) == content_size:
+            return [list(s) for s in state['segments']]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def save_segment_state(file_path, content_size, segments):
+    """Record the per-segment progress so the download can resume after a restart"""
+    part_path = file_path + '.part'
+    with open(part_path + '.tmp', 'w') as f:
+        json.dump({'size': content_size, 'segments': segments}, f)
+    os.replace(part_path + '.tmp', part_path)
+
+
+def is_cancelled(token):
+    """Check whether the user cancelled through the cancellation token"""
+    return bool(token and hasattr(token, 'is_cancelled') and token.is_cancelled())
+
+
+class CancelMirror:
+    """
+    Python-side copy of a cancellation token
+
+    The Kotlin CancelToken is asked at most every `interval` seconds and the
+    answer is kept in between, so the read loops can check for cancellation
+    on every chunk without a JNI call. Once cancelled it stays cancelled.
+    """
+
+    def __init__(self, token, interval=CANCEL_POLL_INTERVAL):
+        self.token = token
+        self.interval = interval
+        self.cancelled = False
+        self.next_poll = 0.0
+
+    def is_cancelled(self):
+        if self.cancelled:
+            return True
+        now = time.monotonic()
+        if now >= self.next_poll:
+            self.next_poll = now + self.interval
+            if is_cancelled(self.token):
+                self.cancelled = True
+        return self.cancelled
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def cancel_mirror(token):
+    """Wrap a bridge token in a CancelMirror, None and mirrors are returned as is"""
+    if token is None or isinstance(token, CancelMirror):
+        return token
+    return CancelMirror(token)
+
+
+class ContentProgress:
+    """
+    Aggregate progress of content files downloaded concurrently
+
+    Every worker reports the bytes it has read so far for its own content,
+    and the combined byte count is sent to the bridge using the same
+    6-argument contract as before (percent, message, current_file,
+    total_files, downloaded_mb, total_mb). Content downloads cover 30-95%.
+
+    Chunk updates are coalesced to at most `rate` bridge calls per second;
+    starting, finishing and failing a file is always sent.
+    """
+
+    def __init__(self, bridge, total_files, total_size, rate=DEFAULT_PROGRESS_RATE):
+        self.lock = threading.Lock()
+        self.bridge = bridge
+        self.total_files = total_files
+        self.total_size = total_size
+        self.total_size_mb = total_size / (1024 * 1024)
+        self.completed_files = 0
+        self.successful_files = 0
+        self.completed_bytes = 0
+        self.inflight = {}
+        # Running sum of self.inflight so a chunk update does not add up every file
+        self.inflight_bytes = 0
+        self.min_interval = 1.0 / rate if rate else 0.0
+        self.next_send = 0.0
+
+    def _downloaded_bytes(self):
+        return self.completed_bytes + self.inflight_bytes
+
+    def _set_inflight(self, content_id, nbytes):
+        self.inflight_bytes += nbytes - self.inflight.get(content_id, 0)
+        self.inflight[content_id] = nbytes
+
+    def _pop_inflight(self, content_id):
+        self.inflight_bytes -= self.inflight.pop(content_id, 0)
+
+    def _percent(self):
+        if self.total_size <= 0:
+            return 30
+        return 30 + (self._downloaded_bytes() / self.total_size) * 65
+
+    def downloaded_mb(self):
+        with self.lock:
+            return self._downloaded_bytes() / (1024 * 1024)
+
+    def _send(self, message, percent=None):
+        if self.bridge:
+            if percent is None:
+                percent = self._percent()
+            self.bridge.update(int(percent), message, self.completed_files, self.total_files,
+                               self._downloaded_bytes() / (1024 * 1024), self.total_size_mb)
+            self.next_send = time.monotonic() + self.min_interval
+
+    def start_file(self, content_id, message):
+        with self.lock:
+            self._set_inflight(content_id, 0)
+            self._send(message)
+
+    def make_callback(self, content_id, content_size):
+        """Create a chunk callback for one content file"""
+        content_size_mb = content_size / (1024 * 1024)
+
+        def callback(chunk_read, chunk_total):
+            if chunk_total <= 0:
+                return
+            with self.lock:
+                self._set_inflight(content_id, chunk_read)
+                # Coalesce chunks, every bridge call crosses into Kotlin
+                if chunk_read != chunk_total and time.monotonic() < self.next_send:
+                    return
+                msg = f"{content_id}.app: {chunk_read / (1024 * 1024):.1f}/{content_size_mb:.1f} MB"
+                self._send(msg)
+        return callback
+
+    def complete_file(self, content_id, content_size):
+        with self.lock:
+            self._pop_inflight(content_id)
+            self.completed_bytes += content_size
+            self.completed_files += 1
+            self.successful_files += 1
+            self._send(f"Completed {content_id}.app")
+
+    def fail_file(self, content_id):
+        with self.lock:
+            self._pop_inflight(content_id)
+            self.completed_files += 1
+            self._send(f"Failed {content_id}.app")
+
+    def cancel(self, message="Download cancelled"):
+        with self.lock:
+            self._send(message, 0)